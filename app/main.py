@@ -1,21 +1,31 @@
 import os
 import sys
 import re
+import asyncio
 
+from prometheus_client import start_http_server
+
+from managers.http import Tracing
 from managers.logging.ILoggingManager import ILoggingManager
 from managers.logging.LoggingManager import LoggingManager
-from managers.match.IMatchManager import IMatchManager
-from managers.match.MatchManager import MatchManager
+from managers.match.IAsyncMatchManager import IAsyncMatchManager
+from managers.match.AsyncMatchManager import AsyncMatchManager
 from managers.ranking.IRankingManager import IRankingManager
 from managers.ranking.RankingManager import RankingManager
-from managers.team.ITeamManager import ITeamManager
-from managers.team.TeamManager import TeamManager
+from managers.team.IAsyncTeamManager import IAsyncTeamManager
+from managers.team.AsyncTeamManager import AsyncTeamManager
+
+# Number of input lines sent to a bulk endpoint in one request
+TEAM_BATCH_SIZE = 500
+MATCH_BATCH_SIZE = 1000
+# Teams of each group that qualify for the next round
+QUALIFYING_TEAMS = 4
 
 class TournamentApp:
     def __init__(
         self,
-        team_manager: ITeamManager,
-        match_manager: IMatchManager,
+        team_manager: IAsyncTeamManager,
+        match_manager: IAsyncMatchManager,
         ranking_manager: IRankingManager,
         logging_manager: ILoggingManager
     ):
@@ -23,6 +33,8 @@ class TournamentApp:
         self.match_manager = match_manager
         self.ranking_manager = ranking_manager
         self.logging_manager = logging_manager
+        # Team and match calls are coroutines; independent ones are awaited together
+        self._loop = asyncio.new_event_loop()
 
     def main_menu(self):
         action = {
@@ -37,6 +49,8 @@ class TournamentApp:
         }
 
         self._clear_terminal()
+        with Tracing.action('sync_rankings'):
+            self._sync_rankings()
 
         while True:
             print("\nOptions:\n")
@@ -51,14 +65,36 @@ class TournamentApp:
 
             choice = input("Enter choice: ")
             self._clear_terminal()
-            action.get(choice, lambda: print("Please enter a number from 1 to 8."))()
+            handler = action.get(choice, lambda: print("Please enter a number from 1 to 8."))
+            # Every service call the action makes carries its correlation ID
+            with Tracing.action(handler.__name__.lstrip('_')):
+                handler()
 
     def _clear_terminal(self):
         os.system('cls' if os.name == 'nt' else 'clear')
 
+    def _run(self, *coroutines):
+        """Runs the coroutines concurrently and returns their results (a single result for one)."""
+        async def gather():
+            return await asyncio.gather(*coroutines)
+        results = self._loop.run_until_complete(gather())
+        return results[0] if len(coroutines) == 1 else results
+
+    def close(self):
+        """Closes the team and match managers' connection pools, then the event loop."""
+        try:
+            self._run(self.team_manager.close(), self.match_manager.close())
+        finally:
+            self._loop.close()
+
+    def _sync_rankings(self):
+        # Seed the ranking service's standings; afterwards they are kept current by deltas
+        self.ranking_manager.refresh_rankings()
+
     def _input_teams(self):
         print("Enter team information (format: <Team name> <Registration date DD/MM> <Group number>):")
         print("Press Enter to exit.\n")
+        batch = []
         while True:
             line = input()
             if line == '':
@@ -73,15 +109,30 @@ class TournamentApp:
                 print("Invalid format. Please enter in the format: <Team name> <Registration date DD/MM> <Group number>")
                 continue
 
-            if self.team_manager.team_exists(name):
-                print(f"\nTeam '{name}' already exists.\n")
+            batch.append({"name": name, "date": date, "group": group})
+            if len(batch) >= TEAM_BATCH_SIZE:
+                self._submit_teams(batch)
+                batch = []
+
+        if batch:
+            self._submit_teams(batch)
+
+    def _submit_teams(self, teams: list):
+        results = self._run(self.team_manager.add_teams(teams))
+        added = []
+        for team, result in zip(teams, results):
+            if not result["created"]:
+                print(f"\nTeam '{team['name']}' was not added: {result['detail']}.\n")
                 continue
-            self.team_manager.add_team(name, date, group)
-            self.logging_manager.log(f"Added team '{name}' with registration date '{date}' and group number {group}.")
+            added.append(team)
+            self.logging_manager.log(f"Added team '{team['name']}' with registration date '{team['date']}' and group number {team['group']}.")
+        if added:
+            self.ranking_manager.add_teams(added)
 
     def _input_matches(self):
         print("Enter match information (format: <Team A> <Team B> <Goals A> <Goals B>):")
         print("Press Enter to exit.\n")
+        batch = []
         while True:
             line = input()
             if line == '':
@@ -95,61 +146,55 @@ class TournamentApp:
                 print("Invalid format. Please enter in the format: <Team A> <Team B> <Goals A> <Goals B>")
                 continue
 
-            if not self.team_manager.team_exists(team_a):
-                print(f"\nTeam '{team_a}' does not exist.\n")
-                self.logging_manager.log(f"Attempted to add match with non-existing team '{team_a}'.")
-                continue
-            if not self.team_manager.team_exists(team_b):
-                print(f"\nTeam '{team_b}' does not exist.\n")
-                self.logging_manager.log(f"Attempted to add match with non-existing team '{team_b}'.")
-                continue
-            # Add check if teams are in the same group
-            if not self.team_manager.is_same_group(team_a, team_b):
-                print(f"\nTeams '{team_a}' and '{team_b}' are not in the same group.\n")
-                self.logging_manager.log(f"Attempted to add match between teams '{team_a}' and '{team_b}' that are not in the same group.")
-                continue
-            if self.match_manager.match_already_exists(team_a, team_b):
-                print(f"\nMatch between '{team_a}' and '{team_b}' already exists.\n")
+            batch.append({"team_a": team_a, "team_b": team_b, "goals_a": goals_a, "goals_b": goals_b})
+            if len(batch) >= MATCH_BATCH_SIZE:
+                self._submit_matches(batch)
+                batch = []
+
+        if batch:
+            self._submit_matches(batch)
+
+    def _submit_matches(self, matches: list):
+        # Team existence, groups and duplicates are all checked by the match service
+        results = self._run(self.match_manager.add_matches(matches))
+        added = []
+        for match, result in zip(matches, results):
+            team_a, team_b = match["team_a"], match["team_b"]
+            if not result["created"]:
+                print(f"\nMatch between '{team_a}' and '{team_b}' was not added: {result['detail']}.\n")
+                self.logging_manager.log(f"Attempted to add match between '{team_a}' and '{team_b}': {result['detail']}.")
                 continue
-            self.match_manager.add_match(team_a, team_b, goals_a, goals_b)
-            self.logging_manager.log(f"Added match between '{team_a}' and '{team_b}' with scores {goals_a}-{goals_b}.")
+            added.append(match)
+            self.logging_manager.log(f"Added match between '{team_a}' and '{team_b}' with scores {match['goals_a']}-{match['goals_b']}.")
+        if added:
+            self.ranking_manager.add_matches(added)
 
     def _display_rankings(self):
-        matches = self.match_manager.all_matches()
-        teams = self.team_manager.all_teams()
-        rankings = self.ranking_manager.calculate_rankings(matches, teams)
-        print(rankings)
+        # Only each group's qualifying teams are selected and shown
+        rankings = self.ranking_manager.get_rankings(limit=QUALIFYING_TEAMS)
 
         for group, ranked_teams in rankings.items():
-            print(f"\nRankings for Group {group}:")
-            qualified_teams = ranked_teams[:4]  # Top 4 teams
+            print(f"\nTeams of Group {group} qualified for the next round:")
             for rank, team_info in enumerate(ranked_teams, start=1):
-                status = "Qualified" if rank <= 4 else "Not Qualified"
                 print(f"{rank}. {team_info['team']} - {team_info['total_points']} points, "
                       f"{team_info['total_goals']} goals, "
-                      f"Registered: {team_info['registration_date']} ({status})")
-
-            # Display the qualified teams separately
-            print("\nTeams qualified for the next round:")
-            for team_info in qualified_teams:
-                print(f"{team_info['team']}")
+                      f"Registered: {team_info['registration_date']}")
 
     def _retrieve_team_details(self):
         print("Enter team name to retrieve details:")
         team_name = input()
 
-        team_details = self.team_manager.retrieve_team(team_name)
+        team_details, team_matches = self._run(
+            self.team_manager.retrieve_team(team_name),
+            self._team_matches(team_name)
+        )
         if team_details:
             print(f"Team: {team_name}")
             print(f"Date: {team_details['date']}")
             print(f"Group: {team_details['group']}")
-
-            all_matches = self.match_manager.all_matches()
-
-            team_matches = [
-                match for match in all_matches 
-                if match['team_a'] == team_name or match['team_b'] == team_name
-            ]
+            team_rank = self.ranking_manager.get_team_rank(team_name)
+            if team_rank:
+                print(f"Position: {team_rank['rank']} ({team_rank['total_points']} points)")
 
             print("Matches:")
             if team_matches:
@@ -161,6 +206,13 @@ class TournamentApp:
         else:
             print(f"Team '{team_name}' not found.")
 
+    async def _team_matches(self, team_name: str) -> list:
+        # Streams all matches but only keeps the team's own
+        return [
+            match async for match in self.match_manager.iter_matches()
+            if match['team_a'] == team_name or match['team_b'] == team_name
+        ]
+
     def _edit_team(self):
         print("Enter team information (format: <Old team name> <New team name> <Registration date DD/MM> <Group number>):")
         print("Press Enter to exit.\n")
@@ -178,32 +230,27 @@ class TournamentApp:
                 print("Invalid format. Please enter in the format: <Old team name> <New team name> <Registration date DD/MM> <Group number>")
                 continue
 
-            if not self.team_manager.team_exists(old_name):
+            # Both names are checked in one lookup
+            teams = self._run(self.team_manager.get_teams([old_name, name]))
+            if old_name not in teams:
                 print(f"\nTeam '{old_name}' does not exist.\n")
                 self.logging_manager.log(f"Attempted to edit non-existing team '{old_name}'.")
                 continue
 
-            if old_name != name and self.team_manager.team_exists(name):
+            if name != old_name and name in teams:
                 print(f"\nTeam '{name}' already exists.\n")
                 continue
 
-            # Update all matches with the new team name
-            all_matches = self.match_manager.all_matches()
-            for match in all_matches:
-                if match['team_a'] == old_name:
-                    self.match_manager.edit_match(match['id'], name, match['team_b'], match['goals_a'], match['goals_b'])
-                elif match['team_b'] == old_name:
-                    self.match_manager.edit_match(match['id'], match['team_a'], name, match['goals_a'], match['goals_b'])
-
-            self.team_manager.edit_team(old_name, name, date, group)
+            # The team service renames the team's matches in the same request
+            if not self._run(self.team_manager.edit_team(old_name, name, date, group)):
+                continue
+            self.ranking_manager.edit_team(old_name, name, date, group)
             self.logging_manager.log(f"Edited team '{old_name}' to new name '{name}', registration date '{date}', and group number {group}.")
 
     def _edit_match(self):
         print("Enter match information (format: <Match ID> <Team A> <Team B> <Goals A> <Goals B>):")
         print("Press Enter to exit.\n")
-        matches = self.match_manager.all_matches()
-        for match in matches:
-            print(f"{match['id']}. {match['team_a']} vs {match['team_b']}: {match['goals_a']}-{match['goals_b']}")
+        self._run(self._list_matches())
 
         while True:
             line = input()
@@ -219,29 +266,52 @@ class TournamentApp:
                 print("Invalid format. Please enter in the format: <Match ID> <Team A> <Team B> <Goals A> <Goals B>")
                 continue
 
-            if not self.match_manager.match_exists(match_id):
+            # The current result is needed to move the match in the rankings
+            old, pair_taken = self._run(
+                self.match_manager.get_match(match_id),
+                self.match_manager.match_already_exists(team_a, team_b)
+            )
+            if old is None:
                 print(f"\nMatch ID '{match_id}' does not exist.\n")
                 self.logging_manager.log(f"Attempted to edit non-existing match ID '{match_id}'.")
                 continue
 
-            if self.match_manager.match_already_exists(team_a, team_b):
+            if pair_taken:
                 print(f"\nMatch between '{team_a}' and '{team_b}' already exists.\n")
                 continue
-            self.match_manager.edit_match(match_id, team_a, team_b, goals_a, goals_b)
+            if not self._run(self.match_manager.edit_match(match_id, team_a, team_b, goals_a, goals_b)):
+                continue
+            edited = {"id": match_id, "team_a": team_a, "team_b": team_b, "goals_a": goals_a, "goals_b": goals_b}
+            self.ranking_manager.edit_match(old, edited)
             self.logging_manager.log(f"Edited match ID '{match_id}' with new details: '{team_a}' vs '{team_b}' with scores {goals_a}-{goals_b}.")
 
+    async def _list_matches(self):
+        async for match in self.match_manager.iter_matches():
+            print(f"{match['id']}. {match['team_a']} vs {match['team_b']}: {match['goals_a']}-{match['goals_b']}")
+
     def _clear_data(self):
-        self.team_manager.delete_all_teams()
-        self.match_manager.delete_all_matches()
+        teams_deleted, matches_deleted = self._run(self.team_manager.delete_all_teams(), self.match_manager.delete_all_matches())
+        if not (teams_deleted and matches_deleted):
+            # Whatever was deleted is gone from the services, so the standings are rebuilt from them
+            self._sync_rankings()
+            return
+        self.ranking_manager.reset_rankings()
         print("All data cleared.")
         self.logging_manager.log("Cleared all teams and matches data.")
 
 
 if __name__ == "__main__":
-    teamManager = TeamManager()
-    matchManager = MatchManager()
+    # Client-side call metrics of the managers, for Prometheus to scrape
+    if os.getenv("METRICS_PORT"):
+        start_http_server(int(os.getenv("METRICS_PORT")))
+
+    teamManager = AsyncTeamManager()
+    matchManager = AsyncMatchManager()
     rankingManager = RankingManager()
     loggingManager = LoggingManager()
 
     app = TournamentApp(teamManager, matchManager, rankingManager, loggingManager)
-    app.main_menu()
+    try:
+        app.main_menu()
+    finally:
+        app.close()
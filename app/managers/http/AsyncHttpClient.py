@@ -0,0 +1,138 @@
+import time
+import asyncio
+import contextlib
+import httpx
+from managers.http.HttpClient import RETRYABLE_METHODS, service_setting
+from managers.http.ETagCache import ETagCache, SAFE_METHODS
+from managers.http.ClientMetrics import ClientMetrics
+from managers.http import Tracing
+from managers.http.WireFormat import WireFormat
+
+RETRYABLE_STATUSES = frozenset({502, 503, 504})
+
+class AsyncHttpClient:
+    """Asyncio counterpart of HttpClient, backed by a pooled httpx.AsyncClient.
+
+    It reads the same environment settings, so one configuration covers both
+    clients, and keeps the same ETag cache and wire format. Requests waiting for a free pooled connection do not time out,
+    which lets callers fan out more requests than the pool size.
+    """
+
+    def __init__(self, base_url: str, service: str):
+        self.max_retries = int(service_setting(service, "MAX_RETRIES", "3"))
+        self.retry_backoff = float(service_setting(service, "RETRY_BACKOFF", "0.2"))
+        pool_size = int(service_setting(service, "POOL_SIZE", "10"))
+        self.client = httpx.AsyncClient(
+            base_url=base_url.rstrip('/'),
+            timeout=httpx.Timeout(
+                float(service_setting(service, "READ_TIMEOUT", "30")),
+                connect=float(service_setting(service, "CONNECT_TIMEOUT", "3")),
+                pool=None
+            ),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        )
+        cache_size = int(service_setting(service, "CACHE_SIZE", "256"))
+        self.cache = ETagCache(cache_size) if cache_size > 0 else None
+        self.metrics = ClientMetrics(service)
+        self.service = service.lower()
+        self.wire = WireFormat(
+            service_setting(service, "WIRE_FORMAT", "msgpack"),
+            int(service_setting(service, "COMPRESS_MIN_SIZE", "16384"))
+        )
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        kwargs["headers"] = self.wire.headers(Tracing.outgoing_headers(kwargs.get("headers")))
+        if "json" in kwargs:
+            kwargs["content"], kwargs["headers"] = self.wire.encode(kwargs.pop("json"), kwargs["headers"])
+        started = time.perf_counter()
+        with Tracing.span(f"call {self.service}", method=method, path=path) as attributes:
+            try:
+                response = await self._request(method, path, **kwargs)
+            except httpx.HTTPError as e:
+                self.metrics.error(method, started, e)
+                attributes["error"] = type(e).__name__
+                raise
+            self.metrics.response(method, started, response.status_code)
+            attributes["status"] = response.status_code
+        return response
+
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        if self.cache is None:
+            return await self._send(method, path, **kwargs)
+        if method not in SAFE_METHODS:
+            self.cache.clear()
+        if method != "GET":
+            return await self._send(method, path, **kwargs)
+
+        key = str(self.client.build_request(method, path, params=kwargs.get("params")).url)
+        cached = self.cache.get(key)
+        if cached is not None:
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), "If-None-Match": cached.headers["ETag"]}
+        response = await self._send(method, path, **kwargs)
+        if response.status_code == 304 and cached is not None:
+            return cached
+        if response.status_code == 200 and "ETag" in response.headers:
+            self.cache.put(key, response)
+        return response
+
+    async def _send(self, method: str, path: str, **kwargs) -> httpx.Response:
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                response = await self.client.request(method, path, **kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                # Nothing reached the service, so any method can be retried
+                if last_attempt:
+                    raise
+            except httpx.TransportError:
+                if last_attempt or method not in RETRYABLE_METHODS:
+                    raise
+            else:
+                if last_attempt or method not in RETRYABLE_METHODS or response.status_code not in RETRYABLE_STATUSES:
+                    return response
+            await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+
+    def decode(self, response: httpx.Response):
+        return self.wire.decode(response)
+
+    async def get(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, **kwargs)
+
+    async def put(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("PUT", path, **kwargs)
+
+    async def delete(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("DELETE", path, **kwargs)
+
+    @contextlib.asynccontextmanager
+    async def stream(self, method: str, path: str, **kwargs):
+        """Opens a streamed response for use with `async with`; streams are not retried or cached.
+
+        Like request(), the call is a span, which lasts until the stream is
+        closed, and its latency up to the response headers is recorded.
+        """
+        headers = Tracing.outgoing_headers(kwargs.pop("headers", None))
+        started = time.perf_counter()
+        with Tracing.span(f"call {self.service}", method=method, path=path) as attributes:
+            try:
+                async with self.client.stream(method, path, headers=headers, **kwargs) as response:
+                    self.metrics.response(method, started, response.status_code)
+                    attributes["status"] = response.status_code
+                    try:
+                        yield response
+                    except httpx.TransportError as e:
+                        # The body broke off after the headers were recorded
+                        self.metrics.failure(method, e)
+                        attributes["error"] = type(e).__name__
+                        raise
+            except httpx.HTTPError as e:
+                if "status" not in attributes:
+                    self.metrics.error(method, started, e)
+                    attributes["error"] = type(e).__name__
+                raise
+
+    async def close(self):
+        await self.client.aclose()
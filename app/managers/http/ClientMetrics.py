@@ -0,0 +1,35 @@
+import time
+from prometheus_client import Counter, Histogram
+
+CALL_SECONDS = Histogram(
+    "http_client_request_duration_seconds",
+    "Time for a call to a service, retries included, up to its response headers",
+    ["service", "method", "status"]
+)
+CALL_FAILURES = Counter(
+    "http_client_request_failures_total",
+    "Calls to a service that raised or came back with a 5xx",
+    ["service", "method", "reason"]
+)
+
+class ClientMetrics:
+    """Records the latency and failures of one service's calls, for all managers using its client.
+
+    The app serves them on METRICS_PORT when that is set.
+    """
+
+    def __init__(self, service: str):
+        self.service = service.lower()
+
+    def response(self, method: str, started: float, status: int):
+        CALL_SECONDS.labels(self.service, method, str(status)).observe(time.perf_counter() - started)
+        if status >= 500:
+            CALL_FAILURES.labels(self.service, method, str(status)).inc()
+
+    def error(self, method: str, started: float, error: Exception):
+        CALL_SECONDS.labels(self.service, method, "error").observe(time.perf_counter() - started)
+        CALL_FAILURES.labels(self.service, method, type(error).__name__).inc()
+
+    def failure(self, method: str, error: Exception):
+        # For calls that raised after their response was already recorded
+        CALL_FAILURES.labels(self.service, method, type(error).__name__).inc()
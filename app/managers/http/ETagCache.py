@@ -0,0 +1,36 @@
+import threading
+from collections import OrderedDict
+
+# Methods that read; any other request from the client may have changed data
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+class ETagCache:
+    """Bounded LRU of GET responses that came with an ETag, keyed by full URL.
+
+    Cached responses are not served blindly: the client still sends the tag
+    as If-None-Match and reuses the cached body only on a 304, so changes
+    made by other clients are always seen.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            response = self._entries.get(key)
+            if response is not None:
+                self._entries.move_to_end(key)
+            return response
+
+    def put(self, key: str, response):
+        with self._lock:
+            self._entries[key] = response
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,115 @@
+import os
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from managers.http.ETagCache import ETagCache, SAFE_METHODS
+from managers.http.ClientMetrics import ClientMetrics
+from managers.http import Tracing
+from managers.http.WireFormat import WireFormat
+
+# Only these are retried after a request may have reached the service; PUTs in
+# this API rename things, so repeating one is not safe. Connection failures are
+# retried for every method since nothing was sent.
+RETRYABLE_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "DELETE"})
+
+def service_setting(service: str, key: str, default: str) -> str:
+    """Reads <SERVICE>_<KEY>, falling back to HTTP_<KEY> and then the default."""
+    return os.getenv(f"{service}_{key}", os.getenv(f"HTTP_{key}", default))
+
+class HttpClient:
+    """Keep-alive HTTP client with its own connection pool for one service.
+
+    Settings come from the environment, e.g. HTTP_POOL_SIZE or, for a single
+    service, TEAM_SERVICE_POOL_SIZE: POOL_SIZE, CONNECT_TIMEOUT, READ_TIMEOUT,
+    MAX_RETRIES, RETRY_BACKOFF, CACHE_SIZE, WIRE_FORMAT and COMPRESS_MIN_SIZE.
+    GET responses that carry an ETag are kept in an LRU of CACHE_SIZE entries
+    (0 disables it) and revalidated with If-None-Match; any write through the
+    client clears it. Bodies are encoded as WireFormat describes, so callers
+    read responses with decode() rather than .json().
+    """
+
+    def __init__(self, base_url: str, service: str):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (
+            float(service_setting(service, "CONNECT_TIMEOUT", "3")),
+            float(service_setting(service, "READ_TIMEOUT", "30"))
+        )
+        retries = Retry(
+            total=int(service_setting(service, "MAX_RETRIES", "3")),
+            backoff_factor=float(service_setting(service, "RETRY_BACKOFF", "0.2")),
+            status_forcelist=(502, 503, 504),
+            allowed_methods=RETRYABLE_METHODS,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=int(service_setting(service, "POOL_SIZE", "10")),
+            max_retries=retries
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        cache_size = int(service_setting(service, "CACHE_SIZE", "256"))
+        self.cache = ETagCache(cache_size) if cache_size > 0 else None
+        self.metrics = ClientMetrics(service)
+        self.service = service.lower()
+        self.wire = WireFormat(
+            service_setting(service, "WIRE_FORMAT", "msgpack"),
+            int(service_setting(service, "COMPRESS_MIN_SIZE", "16384"))
+        )
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        kwargs["headers"] = self.wire.headers(Tracing.outgoing_headers(kwargs.get("headers")))
+        if "json" in kwargs:
+            kwargs["data"], kwargs["headers"] = self.wire.encode(kwargs.pop("json"), kwargs["headers"])
+        started = time.perf_counter()
+        with Tracing.span(f"call {self.service}", method=method, path=path) as attributes:
+            try:
+                response = self._request(method, path, **kwargs)
+            except requests.RequestException as e:
+                self.metrics.error(method, started, e)
+                attributes["error"] = type(e).__name__
+                raise
+            self.metrics.response(method, started, response.status_code)
+            attributes["status"] = response.status_code
+        return response
+
+    def _request(self, method: str, path: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        url = f"{self.base_url}{path}"
+        if self.cache is None:
+            return self.session.request(method, url, **kwargs)
+        if method not in SAFE_METHODS:
+            self.cache.clear()
+        if method != "GET" or kwargs.get("stream"):
+            return self.session.request(method, url, **kwargs)
+
+        key = requests.Request(method, url, params=kwargs.get("params")).prepare().url
+        cached = self.cache.get(key)
+        if cached is not None:
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), "If-None-Match": cached.headers["ETag"]}
+        response = self.session.request(method, url, **kwargs)
+        if response.status_code == 304 and cached is not None:
+            return cached
+        if response.status_code == 200 and "ETag" in response.headers:
+            self.cache.put(key, response)
+        return response
+
+    def decode(self, response: requests.Response):
+        return self.wire.decode(response)
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request("POST", path, **kwargs)
+
+    def put(self, path: str, **kwargs) -> requests.Response:
+        return self.request("PUT", path, **kwargs)
+
+    def delete(self, path: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", path, **kwargs)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,74 @@
+import os
+import json
+import time
+import uuid
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+CORRELATION_HEADER = "X-Correlation-ID"
+
+correlation_id: ContextVar[Optional[str]] = ContextVar("correlation_id", default=None)
+current_span: ContextVar[Optional[dict]] = ContextVar("current_span", default=None)
+
+class SpanExporter:
+    """Keeps the last TRACE_BUFFER_SIZE spans and appends every span to TRACE_FILE, if set.
+
+    The services write spans in the same format, so the app's TRACE_FILE and
+    theirs can be read together to break an action down by hop.
+    """
+
+    def __init__(self, path: Optional[str], max_spans: int):
+        self.path = path
+        self.spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def export(self, span: dict):
+        self.spans.append(span)
+        if self.path:
+            line = json.dumps(span) + "\n"
+            with self._lock, open(self.path, "a") as trace_file:
+                trace_file.write(line)
+
+exporter = SpanExporter(os.getenv("TRACE_FILE"), int(os.getenv("TRACE_BUFFER_SIZE", "10000")))
+
+@contextmanager
+def span(name: str, **attributes):
+    """Times the block as a child of the current span; yields the span's attributes for adding to."""
+    parent = current_span.get()
+    record = {
+        "correlation_id": correlation_id.get(),
+        "span_id": uuid.uuid4().hex[:16],
+        "parent_id": parent["span_id"] if parent else None,
+        "service": "app",
+        "name": name,
+        "start": time.time(),
+        "attributes": attributes,
+    }
+    token = current_span.set(record)
+    started = time.perf_counter()
+    try:
+        yield attributes
+    finally:
+        record["duration_ms"] = (time.perf_counter() - started) * 1000
+        current_span.reset(token)
+        exporter.export(record)
+
+@contextmanager
+def action(name: str):
+    """Runs one user action under a new correlation ID, which every manager call then sends."""
+    token = correlation_id.set(uuid.uuid4().hex)
+    try:
+        with span(name):
+            yield
+    finally:
+        correlation_id.reset(token)
+
+def outgoing_headers(headers: Optional[dict]) -> Optional[dict]:
+    """The request's headers plus the current correlation ID, if there is one."""
+    correlation = correlation_id.get()
+    if correlation is None:
+        return headers
+    return {**(headers or {}), CORRELATION_HEADER: correlation}
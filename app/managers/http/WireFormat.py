@@ -0,0 +1,45 @@
+import json
+import zlib
+import msgpack
+
+MSGPACK = "application/msgpack"
+
+class WireFormat:
+    """Body encoding for one service's client, from <SERVICE>_WIRE_FORMAT and _COMPRESS_MIN_SIZE.
+
+    With the default "msgpack", JSON bodies are sent as MessagePack and
+    MessagePack responses are asked for; "json" keeps plain JSON. Bodies of at
+    least COMPRESS_MIN_SIZE bytes are gzipped (0 turns that off). Compressed
+    responses need nothing here: requests and httpx advertise and decode the
+    encodings they support.
+    """
+
+    def __init__(self, format: str, compress_min_size: int):
+        self.msgpack = format == "msgpack"
+        self.compress_min_size = compress_min_size
+
+    def headers(self, headers: dict = None) -> dict:
+        if not self.msgpack:
+            return headers
+        return {"Accept": f"{MSGPACK}, application/json;q=0.9", **(headers or {})}
+
+    def encode(self, payload, headers: dict = None):
+        """Returns the encoded body of a `json=` payload and the headers to send it with."""
+        if self.msgpack:
+            body, content_type = msgpack.packb(payload), MSGPACK
+        else:
+            body, content_type = json.dumps(payload, separators=(",", ":")).encode(), "application/json"
+        headers = {**(headers or {}), "Content-Type": content_type}
+        if self.compress_min_size and len(body) >= self.compress_min_size:
+            # Level 1: the gain over higher levels is small next to the CPU it saves
+            compressor = zlib.compressobj(1, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            body = compressor.compress(body) + compressor.flush()
+            headers["Content-Encoding"] = "gzip"
+        return body, headers
+
+    @staticmethod
+    def decode(response):
+        """The body of a requests or httpx response, whether it came as MessagePack or JSON."""
+        if response.headers.get("Content-Type", "").startswith(MSGPACK):
+            return msgpack.unpackb(response.content)
+        return response.json()
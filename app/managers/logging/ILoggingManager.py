@@ -7,4 +7,16 @@ class ILoggingManager(ABC):
 
     @abstractmethod
     def view_logs(self) -> list:
+        pass
+
+    @abstractmethod
+    def iter_logs(self, before: str = None):
+        pass
+
+    @abstractmethod
+    def flush(self):
+        pass
+
+    @abstractmethod
+    def close(self):
         pass
\ No newline at end of file
@@ -1,33 +1,136 @@
 import os
-import requests
+import json
+import time
+import queue
+import atexit
+import threading
 from requests.exceptions import RequestException
 from datetime import datetime
+from managers.http.HttpClient import HttpClient
 from managers.logging.ILoggingManager import ILoggingManager
 
 class LoggingManager(ILoggingManager):
+    """Buffers log messages and ships them to the log service in the background.
+
+    `log` only puts the message on a bounded queue. A worker thread sends the
+    queue to POST /logs/batch once LOG_BATCH_SIZE messages are waiting or
+    LOG_FLUSH_INTERVAL seconds after the first one, and whatever is left is
+    sent on exit. When the queue (LOG_QUEUE_SIZE) is full, new messages are
+    dropped and the number dropped is logged once space frees up, so the
+    caller never waits on logging.
+    """
+
     def __init__(self):
         self.log_service_url = os.getenv('LOG_SERVICE_URL')
         if not self.log_service_url:
             raise ValueError("LOG_SERVICE_URL environment variable not set")
-    
+        self.http = HttpClient(self.log_service_url, "LOG_SERVICE")
+
+        self.batch_size = int(os.getenv('LOG_BATCH_SIZE', '100'))
+        self.flush_interval = float(os.getenv('LOG_FLUSH_INTERVAL', '1.0'))
+        self._queue = queue.Queue(maxsize=int(os.getenv('LOG_QUEUE_SIZE', '10000')))
+        self._dropped = 0
+        self._send_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._worker = threading.Thread(target=self._run, name="log-shipper", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
     def log(self, message: str):
-        """Logs a message by making a POST request to the log service API."""
-        payload = {
+        """Queues a message for the log service without waiting for it to be sent."""
+        entry = {
             "message": message,
             "timestamp": datetime.now().isoformat()
         }
         try:
-            response = requests.post(f"{self.log_service_url}/logs", json=payload)
-            response.raise_for_status()
-        except RequestException as e:
-            print(f"Failed to log message. Error: {e}")
-    
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self._dropped += 1
+
+    def flush(self):
+        """Sends every queued message now."""
+        self._send(self._drain())
+
+    def close(self):
+        """Stops the worker and sends whatever is still queued."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._worker.join(timeout=self.flush_interval + 1)
+        self.flush()
+
     def view_logs(self) -> list:
         """Retrieves all logs by making a GET request to the log service API."""
+        self.flush()
         try:
-            response = requests.get(f"{self.log_service_url}/logs")
+            response = self.http.get("/logs")
             response.raise_for_status()
-            return response.json()
+            return self.http.decode(response)
         except RequestException as e:
             print(f"Failed to retrieve logs. Error: {e}")
-            return []
\ No newline at end of file
+            return []
+
+    def iter_logs(self, before: str = None):
+        """Yields logs newest first from the service's NDJSON stream, one at a time.
+
+        `before` is a '<ISO timestamp>,<id>' cursor to resume after a given log.
+        """
+        self.flush()
+        params = {"stream": "true"}
+        if before:
+            params["before"] = before
+        try:
+            with self.http.get("/logs", params=params, stream=True) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if line:
+                        yield json.loads(line)
+        except RequestException as e:
+            print(f"Failed to stream logs. Error: {e}")
+
+    def _run(self):
+        while not self._closed.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._send(batch)
+
+    def _next_batch(self) -> list:
+        # Wait for a first message, then collect until the batch is full or the interval is up
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self) -> list:
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def _send(self, batch: list):
+        if self._dropped:
+            dropped, self._dropped = self._dropped, 0
+            batch.append({
+                "message": f"Dropped {dropped} log messages because the log queue was full.",
+                "timestamp": datetime.now().isoformat()
+            })
+        if not batch:
+            return
+        with self._send_lock:
+            try:
+                response = self.http.post("/logs/batch", json=batch)
+                response.raise_for_status()
+            except RequestException as e:
+                print(f"Failed to log {len(batch)} messages. Error: {e}")
\ No newline at end of file
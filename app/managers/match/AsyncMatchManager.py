@@ -0,0 +1,122 @@
+import os
+import json
+import httpx
+from managers.http.AsyncHttpClient import AsyncHttpClient
+from managers.match.IAsyncMatchManager import IAsyncMatchManager
+
+class AsyncMatchManager(IAsyncMatchManager):
+    def __init__(self):
+        self.match_service_url = os.getenv('MATCH_SERVICE_URL')
+        if not self.match_service_url:
+            raise ValueError("MATCH_SERVICE_URL environment variable not set")
+        self.http = AsyncHttpClient(self.match_service_url, "MATCH_SERVICE")
+
+    async def add_match(self, team_a: str, team_b: str, goals_a: int, goals_b: int):
+        """Adds a match by making a POST request to the match service API."""
+        payload = {
+            "team_a": team_a,
+            "team_b": team_b,
+            "goals_a": goals_a,
+            "goals_b": goals_b
+        }
+        try:
+            response = await self.http.post("/matches", json=payload)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            print(f"Failed to add match between '{team_a}' and '{team_b}'. Error: {e}")
+
+    async def add_matches(self, matches: list) -> list:
+        """Adds a batch of matches in one POST request and returns the per-match results."""
+        try:
+            response = await self.http.post("/matches/bulk", json=matches)
+            response.raise_for_status()
+            return self.http.decode(response)
+        except httpx.HTTPError as e:
+            print(f"Failed to add {len(matches)} matches. Error: {e}")
+            return [{**match, "created": False, "id": None, "detail": str(e)} for match in matches]
+
+    async def all_matches(self) -> list:
+        """Retrieves all matches by making a GET request to the match service API."""
+        try:
+            response = await self.http.get("/matches")
+            response.raise_for_status()  # Raise error for bad responses
+            return self.http.decode(response)  # Assuming the API returns the matches in JSON format
+        except httpx.HTTPError as e:
+            print(f"Failed to retrieve matches. Error: {e}")
+            return []
+
+    async def iter_matches(self, after_id: int = None):
+        """Yields matches in id order from the service's NDJSON stream, one at a time.
+
+        `after_id` resumes the stream after the match with that id.
+        """
+        params = {"stream": "true"}
+        if after_id is not None:
+            params["after_id"] = after_id
+        try:
+            async with self.http.stream("GET", "/matches", params=params) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if line:
+                        yield json.loads(line)
+        except httpx.HTTPError as e:
+            print(f"Failed to stream matches. Error: {e}")
+        
+    async def match_already_exists(self, team_a: str, team_b: str) -> bool:
+        """Checks if a match between two teams already exists by making a GET request to the match service API."""
+        try:
+            response = await self.http.get(f"/matches/{team_a}/{team_b}")
+            response.raise_for_status()
+            return len(self.http.decode(response)) > 0
+        except httpx.HTTPError as e:
+            return False
+
+    async def edit_match(self, match_id: int, team_a: str, team_b: str, goals_a: int, goals_b: int) -> bool:
+        """Edits an existing match by making a PUT request to the match service API."""
+        payload = {
+            "team_a": team_a,
+            "team_b": team_b,
+            "goals_a": goals_a,
+            "goals_b": goals_b
+        }
+        try:
+            response = await self.http.put(f"/matches/{match_id}", json=payload)
+            response.raise_for_status()
+            print(f"Match {match_id} updated successfully.")
+            return True
+        except httpx.HTTPError as e:
+            print(f"Failed to update match {match_id}. Error: {e}")
+            return False
+    
+    async def get_match(self, match_id: int):
+        """Retrieves a match by its ID, or None if it does not exist."""
+        try:
+            response = await self.http.get(f"/matches/{match_id}")
+            if response.status_code == 200:
+                return self.http.decode(response)
+        except httpx.HTTPError as e:
+            pass
+        return None
+
+    async def match_exists(self, match_id: int) -> bool:
+        """Checks if a match exists by making a GET request to the match service API."""
+        try:
+            response = await self.http.get(f"/matches/{match_id}")
+            return response.status_code == 200
+        except httpx.HTTPError as e:
+            return False
+
+    async def delete_all_matches(self) -> bool:
+        """Deletes all matches by making a DELETE request to the match service API."""
+        try:
+            response = await self.http.delete("/matches")
+            response.raise_for_status()
+            print("All matches deleted successfully.")
+            return True
+        except httpx.HTTPError as e:
+            print(f"Failed to delete all matches. Error: {e}")
+            return False
+
+    async def close(self):
+        """Closes the keep-alive connections to the match service."""
+        await self.http.close()
@@ -0,0 +1,42 @@
+from abc import ABC, abstractmethod
+
+class IAsyncMatchManager(ABC):
+    @abstractmethod
+    async def add_match(self, team_a: str, team_b: str, goals_a: int, goals_b: int):
+        pass
+
+    @abstractmethod
+    async def add_matches(self, matches: list) -> list:
+        pass
+
+    @abstractmethod
+    async def all_matches(self) -> list:
+        pass
+
+    @abstractmethod
+    def iter_matches(self, after_id: int = None):
+        pass
+
+    @abstractmethod
+    async def match_already_exists(self, team_a: str, team_b: str) -> bool:
+        pass
+
+    @abstractmethod
+    async def edit_match(self, match_id: int, team_a: str, team_b: str, goals_a: int, goals_b: int) -> bool:
+        pass
+
+    @abstractmethod
+    async def get_match(self, match_id: int):
+        pass
+
+    @abstractmethod
+    async def match_exists(self, match_id: int) -> bool:
+        pass
+
+    @abstractmethod
+    async def delete_all_matches(self) -> bool:
+        pass
+
+    @abstractmethod
+    async def close(self):
+        pass
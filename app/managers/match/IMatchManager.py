@@ -5,14 +5,22 @@ class IMatchManager(ABC):
     def add_match(self, team_a: str, team_b: str, goals_a: int, goals_b: int):
         pass
 
+    @abstractmethod
+    def add_matches(self, matches: list) -> list:
+        pass
+
     @abstractmethod
     def all_matches(self) -> list:
         pass
+
+    @abstractmethod
+    def iter_matches(self, after_id: int = None):
+        pass
     
     @abstractmethod
-    def edit_match(self, match_id: int, team_a: str, team_b: str, goals_a: int, goals_b: int):
+    def edit_match(self, match_id: int, team_a: str, team_b: str, goals_a: int, goals_b: int) -> bool:
         pass
 
     @abstractmethod
-    def delete_all_matches(self):
+    def delete_all_matches(self) -> bool:
         pass
\ No newline at end of file
@@ -1,6 +1,7 @@
 import os
-import requests
+import json
 from requests.exceptions import RequestException
+from managers.http.HttpClient import HttpClient
 from managers.match.IMatchManager import IMatchManager
 
 class MatchManager(IMatchManager):
@@ -8,6 +9,7 @@ class MatchManager(IMatchManager):
         self.match_service_url = os.getenv('MATCH_SERVICE_URL')
         if not self.match_service_url:
             raise ValueError("MATCH_SERVICE_URL environment variable not set")
+        self.http = HttpClient(self.match_service_url, "MATCH_SERVICE")
 
     def add_match(self, team_a: str, team_b: str, goals_a: int, goals_b: int):
         """Adds a match by making a POST request to the match service API."""
@@ -18,31 +20,58 @@ class MatchManager(IMatchManager):
             "goals_b": goals_b
         }
         try:
-            response = requests.post(f"{self.match_service_url}/matches", json=payload)
+            response = self.http.post("/matches", json=payload)
             response.raise_for_status()
         except RequestException as e:
             print(f"Failed to add match between '{team_a}' and '{team_b}'. Error: {e}")
 
+    def add_matches(self, matches: list) -> list:
+        """Adds a batch of matches in one POST request and returns the per-match results."""
+        try:
+            response = self.http.post("/matches/bulk", json=matches)
+            response.raise_for_status()
+            return self.http.decode(response)
+        except RequestException as e:
+            print(f"Failed to add {len(matches)} matches. Error: {e}")
+            return [{**match, "created": False, "id": None, "detail": str(e)} for match in matches]
+
     def all_matches(self) -> list:
         """Retrieves all matches by making a GET request to the match service API."""
         try:
-            response = requests.get(f"{self.match_service_url}/matches")
+            response = self.http.get("/matches")
             response.raise_for_status()  # Raise error for bad responses
-            return response.json()  # Assuming the API returns the matches in JSON format
+            return self.http.decode(response)  # Assuming the API returns the matches in JSON format
         except RequestException as e:
             print(f"Failed to retrieve matches. Error: {e}")
             return []
+
+    def iter_matches(self, after_id: int = None):
+        """Yields matches in id order from the service's NDJSON stream, one at a time.
+
+        `after_id` resumes the stream after the match with that id.
+        """
+        params = {"stream": "true"}
+        if after_id is not None:
+            params["after_id"] = after_id
+        try:
+            with self.http.get("/matches", params=params, stream=True) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if line:
+                        yield json.loads(line)
+        except RequestException as e:
+            print(f"Failed to stream matches. Error: {e}")
         
     def match_already_exists(self, team_a: str, team_b: str) -> bool:
         """Checks if a match between two teams already exists by making a GET request to the match service API."""
         try:
-            response = requests.get(f"{self.match_service_url}/matches/{team_a}/{team_b}")
+            response = self.http.get(f"/matches/{team_a}/{team_b}")
             response.raise_for_status()
-            return len(response.json()) > 0
+            return len(self.http.decode(response)) > 0
         except RequestException as e:
             return False
 
-    def edit_match(self, match_id: int, team_a: str, team_b: str, goals_a: int, goals_b: int):
+    def edit_match(self, match_id: int, team_a: str, team_b: str, goals_a: int, goals_b: int) -> bool:
         """Edits an existing match by making a PUT request to the match service API."""
         payload = {
             "team_a": team_a,
@@ -51,25 +80,39 @@ class MatchManager(IMatchManager):
             "goals_b": goals_b
         }
         try:
-            response = requests.put(f"{self.match_service_url}/matches/{match_id}", json=payload)
+            response = self.http.put(f"/matches/{match_id}", json=payload)
             response.raise_for_status()
             print(f"Match {match_id} updated successfully.")
+            return True
         except RequestException as e:
             print(f"Failed to update match {match_id}. Error: {e}")
+            return False
     
+    def get_match(self, match_id: int):
+        """Retrieves a match by its ID, or None if it does not exist."""
+        try:
+            response = self.http.get(f"/matches/{match_id}")
+            if response.status_code == 200:
+                return self.http.decode(response)
+        except RequestException as e:
+            pass
+        return None
+
     def match_exists(self, match_id: int) -> bool:
         """Checks if a match exists by making a GET request to the match service API."""
         try:
-            response = requests.get(f"{self.match_service_url}/matches/{match_id}")
+            response = self.http.get(f"/matches/{match_id}")
             return response.status_code == 200
         except RequestException as e:
             return False
 
-    def delete_all_matches(self):
+    def delete_all_matches(self) -> bool:
         """Deletes all matches by making a DELETE request to the match service API."""
         try:
-            response = requests.delete(f"{self.match_service_url}/matches")
+            response = self.http.delete("/matches")
             response.raise_for_status()
             print("All matches deleted successfully.")
+            return True
         except RequestException as e:
-            print(f"Failed to delete all matches. Error: {e}")
\ No newline at end of file
+            print(f"Failed to delete all matches. Error: {e}")
+            return False
\ No newline at end of file
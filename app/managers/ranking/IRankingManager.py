@@ -3,4 +3,36 @@ from abc import ABC, abstractmethod
 class IRankingManager(ABC):
     @abstractmethod
     def calculate_rankings(self, matches: list, teams: list) -> list:
+        pass
+
+    @abstractmethod
+    def get_rankings(self, limit: int = None) -> dict:
+        pass
+
+    @abstractmethod
+    def get_team_rank(self, name: str) -> dict:
+        pass
+
+    @abstractmethod
+    def refresh_rankings(self) -> dict:
+        pass
+
+    @abstractmethod
+    def add_teams(self, teams: list):
+        pass
+
+    @abstractmethod
+    def edit_team(self, old_name: str, name: str, date: str, group: int):
+        pass
+
+    @abstractmethod
+    def add_matches(self, matches: list):
+        pass
+
+    @abstractmethod
+    def edit_match(self, old: dict, new: dict):
+        pass
+
+    @abstractmethod
+    def reset_rankings(self):
         pass
\ No newline at end of file
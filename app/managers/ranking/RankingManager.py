@@ -1,6 +1,6 @@
 import os
-import requests
 from requests.exceptions import RequestException
+from managers.http.HttpClient import HttpClient
 from managers.ranking.IRankingManager import IRankingManager
 
 class RankingManager(IRankingManager):
@@ -8,6 +8,7 @@ class RankingManager(IRankingManager):
         self.ranking_service_url = os.getenv('RANKING_SERVICE_URL')
         if not self.ranking_service_url:
             raise ValueError("RANKING_SERVICE_URL environment variable not set")
+        self.http = HttpClient(self.ranking_service_url, "RANKING_SERVICE")
         
     def calculate_rankings(self, matches: list, teams: list) -> list:
         """Calculates the rankings based on match results."""
@@ -16,9 +17,87 @@ class RankingManager(IRankingManager):
             "teams": teams
         }
         try:
-            response = requests.post(f"{self.ranking_service_url}/rankings", json=payload)
+            response = self.http.post("/rankings", json=payload)
             response.raise_for_status()
-            return response.json()
+            return self.http.decode(response)
         except RequestException as e:
             print(f"Failed to calculate rankings. Error: {e}")
-            return {}
\ No newline at end of file
+            return {}
+
+    def get_rankings(self, limit: int = None) -> dict:
+        """Retrieves the current standings kept by the ranking service, only each group's top `limit` if given."""
+        params = {"limit": limit} if limit is not None else None
+        try:
+            response = self.http.get("/rankings", params=params)
+            response.raise_for_status()
+            return self.http.decode(response)
+        except RequestException as e:
+            print(f"Failed to retrieve rankings. Error: {e}")
+            return {}
+
+    def get_team_rank(self, name: str) -> dict:
+        """Retrieves a team's rank and standing in its group, or None if the standings do not have it."""
+        try:
+            response = self.http.get(f"/rankings/team/{name}")
+            if response.status_code == 404:
+                return None
+            response.raise_for_status()
+            return self.http.decode(response)
+        except RequestException as e:
+            print(f"Failed to retrieve rank of team '{name}'. Error: {e}")
+            return None
+
+    def refresh_rankings(self) -> dict:
+        """Has the ranking service rebuild its standings from the team and match services."""
+        try:
+            response = self.http.get("/rankings", params={"source": "services"})
+            response.raise_for_status()
+            return self.http.decode(response)
+        except RequestException as e:
+            print(f"Failed to refresh rankings. Error: {e}")
+            return {}
+
+    def add_teams(self, teams: list):
+        """Registers new teams with the ranking service's standings."""
+        try:
+            response = self.http.post("/rankings/teams", json={"teams": teams})
+            response.raise_for_status()
+        except RequestException as e:
+            print(f"Failed to update rankings with new teams. Error: {e}")
+
+    def edit_team(self, old_name: str, name: str, date: str, group: int):
+        """Applies a team rename, registration date or group change to the standings."""
+        payload = {
+            "name": name,
+            "date": date,
+            "group": group
+        }
+        try:
+            response = self.http.put(f"/rankings/teams/{old_name}", json=payload)
+            response.raise_for_status()
+        except RequestException as e:
+            print(f"Failed to update rankings for team '{old_name}'. Error: {e}")
+
+    def add_matches(self, matches: list):
+        """Applies new match results to the standings."""
+        try:
+            response = self.http.post("/rankings/matches", json={"matches": matches})
+            response.raise_for_status()
+        except RequestException as e:
+            print(f"Failed to update rankings with new matches. Error: {e}")
+
+    def edit_match(self, old: dict, new: dict):
+        """Replaces a match result in the standings with its edited version."""
+        try:
+            response = self.http.put("/rankings/matches", json={"old": old, "new": new})
+            response.raise_for_status()
+        except RequestException as e:
+            print(f"Failed to update rankings for edited match. Error: {e}")
+
+    def reset_rankings(self):
+        """Clears all standings kept by the ranking service."""
+        try:
+            response = self.http.delete("/rankings")
+            response.raise_for_status()
+        except RequestException as e:
+            print(f"Failed to reset rankings. Error: {e}")
\ No newline at end of file
@@ -0,0 +1,108 @@
+import os
+import httpx
+from managers.http.AsyncHttpClient import AsyncHttpClient
+from managers.team.IAsyncTeamManager import IAsyncTeamManager
+
+class AsyncTeamManager(IAsyncTeamManager):
+    def __init__(self):
+        self.team_service_url = os.getenv('TEAM_SERVICE_URL')
+        if not self.team_service_url:
+            raise ValueError("TEAM_SERVICE_URL environment variable not set")
+        self.http = AsyncHttpClient(self.team_service_url, "TEAM_SERVICE")
+
+    async def add_team(self, name: str, date: str, group: int):
+        """Adds a team by making a POST request to the team service API."""
+        payload = {
+            "name": name,
+            "date": date,
+            "group": group
+        }
+        try:
+            response = await self.http.post("/teams", json=payload)
+        except httpx.HTTPError as e:
+            print(f"Failed to add team '{name}'. Error: {e}")
+
+    async def add_teams(self, teams: list) -> list:
+        """Adds a batch of teams in one POST request and returns the per-team results."""
+        try:
+            response = await self.http.post("/teams/bulk", json=teams)
+            response.raise_for_status()
+            return self.http.decode(response)
+        except httpx.HTTPError as e:
+            print(f"Failed to add {len(teams)} teams. Error: {e}")
+            return [{"name": team["name"], "created": False, "detail": str(e)} for team in teams]
+
+    async def all_teams(self) -> list:
+        """Retrieves all teams by making a GET request to the team service API."""
+        try:
+            response = await self.http.get("/teams")
+            response.raise_for_status()
+            return self.http.decode(response)
+        except httpx.HTTPError as e:
+            print(f"Failed to retrieve teams. Error: {e}")
+            return []
+
+    async def edit_team(self, old_name: str, name: str, date: str, group: int) -> bool:
+        """Edits team details by making a PUT request to the team service API.
+
+        The team service moves the team's matches over to a new name itself.
+        """
+        payload = {
+            "name": name,
+            "date": date,
+            "group": group
+        }
+        try:
+            response = await self.http.put(f"/teams/{old_name}", json=payload)
+            response.raise_for_status()
+            print(f"Team '{old_name}' updated to '{name}' successfully.")
+            return True
+        except httpx.HTTPError as e:
+            print(f"Failed to update team '{old_name}'. Error: {e}")
+            return False
+
+    async def retrieve_team(self, name: str) -> dict:
+        """Retrieves team details by making a GET request to the team service API."""
+        try:
+            response = await self.http.get(f"/teams/{name}")
+            response.raise_for_status()
+            return self.http.decode(response)
+        except httpx.HTTPError as e:
+            print(f"Failed to retrieve team '{name}'. Error: {e}")
+
+    async def get_teams(self, names: list) -> dict:
+        """Retrieves the named teams that exist in one GET request, keyed by name."""
+        try:
+            # A GET rather than POST /teams/lookup, so repeated lookups are revalidated from the cache
+            response = await self.http.get("/teams", params={"names": list(names)})
+            response.raise_for_status()
+            return {team["name"]: team for team in self.http.decode(response)}
+        except httpx.HTTPError as e:
+            print(f"Failed to look up teams. Error: {e}")
+            return {}
+
+    async def team_exists(self, name: str) -> bool:
+        """Checks if a team exists with a lookup request to the team service API."""
+        return name in await self.get_teams([name])
+
+    async def is_same_group(self, name1: str, name2: str) -> bool:
+        """Checks if two teams exist and are in the same group, in one lookup request."""
+        teams = await self.get_teams([name1, name2])
+        if name1 not in teams or name2 not in teams:
+            return False
+        return teams[name1]["group"] == teams[name2]["group"]
+
+    async def delete_all_teams(self) -> bool:
+        """Deletes all teams by making a DELETE request to the team service API."""
+        try:
+            response = await self.http.delete("/teams")
+            response.raise_for_status()
+            print("All teams deleted successfully.")
+            return True
+        except httpx.HTTPError as e:
+            print(f"Failed to delete all teams. Error: {e}")
+            return False
+
+    async def close(self):
+        """Closes the keep-alive connections to the team service."""
+        await self.http.close()
@@ -0,0 +1,42 @@
+from abc import ABC, abstractmethod
+
+class IAsyncTeamManager(ABC):
+    @abstractmethod
+    async def add_team(self, name: str, date: str, group: int):
+        pass
+
+    @abstractmethod
+    async def add_teams(self, teams: list) -> list:
+        pass
+
+    @abstractmethod
+    async def all_teams(self) -> list:
+        pass
+
+    @abstractmethod
+    async def edit_team(self, old_name: str, name: str, date: str, group: int) -> bool:
+        pass
+
+    @abstractmethod
+    async def retrieve_team(self, name: str) -> dict:
+        pass
+
+    @abstractmethod
+    async def get_teams(self, names: list) -> dict:
+        pass
+
+    @abstractmethod
+    async def team_exists(self, name: str) -> bool:
+        pass
+
+    @abstractmethod
+    async def is_same_group(self, name1: str, name2: str) -> bool:
+        pass
+
+    @abstractmethod
+    async def delete_all_teams(self) -> bool:
+        pass
+
+    @abstractmethod
+    async def close(self):
+        pass
@@ -5,12 +5,20 @@ class ITeamManager(ABC):
     def add_team(self, name: str, date: str, group: int):
         pass
 
+    @abstractmethod
+    def add_teams(self, teams: list) -> list:
+        pass
+
     @abstractmethod
     def all_teams(self) -> list:
         pass
 
     @abstractmethod
-    def edit_team(self, old_name: str, name: str, date: str, group: int):
+    def edit_team(self, old_name: str, name: str, date: str, group: int) -> bool:
+        pass
+
+    @abstractmethod
+    def get_teams(self, names: list) -> dict:
         pass
 
     @abstractmethod
@@ -22,5 +30,5 @@ class ITeamManager(ABC):
         pass
 
     @abstractmethod
-    def delete_all_teams(self):
+    def delete_all_teams(self) -> bool:
         pass
\ No newline at end of file
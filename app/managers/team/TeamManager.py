@@ -1,6 +1,6 @@
 import os
-import requests
 from requests.exceptions import RequestException
+from managers.http.HttpClient import HttpClient
 from managers.team.ITeamManager import ITeamManager
 
 class TeamManager(ITeamManager):
@@ -8,6 +8,7 @@ class TeamManager(ITeamManager):
         self.team_service_url = os.getenv('TEAM_SERVICE_URL')
         if not self.team_service_url:
             raise ValueError("TEAM_SERVICE_URL environment variable not set")
+        self.http = HttpClient(self.team_service_url, "TEAM_SERVICE")
 
     def add_team(self, name: str, date: str, group: int):
         """Adds a team by making a POST request to the team service API."""
@@ -17,90 +18,87 @@ class TeamManager(ITeamManager):
             "group": group
         }
         try:
-            response = requests.post(f"{self.team_service_url}/teams", json=payload)
+            response = self.http.post("/teams", json=payload)
         except RequestException as e:
             print(f"Failed to add team '{name}'. Error: {e}")
 
+    def add_teams(self, teams: list) -> list:
+        """Adds a batch of teams in one POST request and returns the per-team results."""
+        try:
+            response = self.http.post("/teams/bulk", json=teams)
+            response.raise_for_status()
+            return self.http.decode(response)
+        except RequestException as e:
+            print(f"Failed to add {len(teams)} teams. Error: {e}")
+            return [{"name": team["name"], "created": False, "detail": str(e)} for team in teams]
+
     def all_teams(self) -> list:
         """Retrieves all teams by making a GET request to the team service API."""
         try:
-            response = requests.get(f"{self.team_service_url}/teams")
+            response = self.http.get("/teams")
             response.raise_for_status()
-            return response.json()
+            return self.http.decode(response)
         except RequestException as e:
             print(f"Failed to retrieve teams. Error: {e}")
             return []
 
-    def edit_team(self, old_name: str, name: str, date: str, group: int):
-        """Edits team details by making a PUT request to the team service API."""
+    def edit_team(self, old_name: str, name: str, date: str, group: int) -> bool:
+        """Edits team details by making a PUT request to the team service API.
+
+        The team service moves the team's matches over to a new name itself.
+        """
         payload = {
             "name": name,
             "date": date,
             "group": group
         }
         try:
-            response = requests.put(f"{self.team_service_url}/teams/{old_name}", json=payload)
+            response = self.http.put(f"/teams/{old_name}", json=payload)
             response.raise_for_status()
             print(f"Team '{old_name}' updated to '{name}' successfully.")
+            return True
         except RequestException as e:
             print(f"Failed to update team '{old_name}'. Error: {e}")
+            return False
 
     def retrieve_team(self, name: str) -> dict:
         """Retrieves team details by making a GET request to the team service API."""
         try:
-            response = requests.get(f"{self.team_service_url}/teams/{name}")
+            response = self.http.get(f"/teams/{name}")
             response.raise_for_status()
-            return response.json()
+            return self.http.decode(response)
         except RequestException as e:
             print(f"Failed to retrieve team '{name}'. Error: {e}")
 
-    def is_same_group(self, name1: str, name2: str) -> bool:
-        """Checks if two teams are in the same group by comparing their group info."""
+    def get_teams(self, names: list) -> dict:
+        """Retrieves the named teams that exist in one GET request, keyed by name."""
         try:
-            response1 = requests.get(f"{self.team_service_url}/teams/{name1}")
-            response2 = requests.get(f"{self.team_service_url}/teams/{name2}")
-            
-            response1.raise_for_status()
-            response2.raise_for_status()
-
-            group1 = response1.json().get("group")
-            group2 = response2.json().get("group")
-            
-            return group1 == group2
+            # A GET rather than POST /teams/lookup, so repeated lookups are revalidated from the cache
+            response = self.http.get("/teams", params={"names": list(names)})
+            response.raise_for_status()
+            return {team["name"]: team for team in self.http.decode(response)}
         except RequestException as e:
-            print(f"Error comparing teams '{name1}' and '{name2}': {e}")
-        return False
+            print(f"Failed to look up teams. Error: {e}")
+            return {}
 
     def team_exists(self, name: str) -> bool:
-        """Checks if a team exists by making a GET request to the team service API."""
-        try:
-            response = requests.get(f"{self.team_service_url}/teams/{name}")
-            return response.status_code == 200
-        except RequestException as e:
-            return False
+        """Checks if a team exists with a lookup request to the team service API."""
+        return name in self.get_teams([name])
 
     def is_same_group(self, name1: str, name2: str) -> bool:
-        """Checks if two teams are in the same group by comparing their group info."""
-        try:
-            response1 = requests.get(f"{self.team_service_url}/teams/{name1}")
-            response2 = requests.get(f"{self.team_service_url}/teams/{name2}")
-            
-            response1.raise_for_status()
-            response2.raise_for_status()
-
-            group1 = response1.json().get("group")
-            group2 = response2.json().get("group")
-            
-            return group1 == group2
-        except RequestException as e:
-            print(f"Error comparing teams '{name1}' and '{name2}': {e}")
-        return False
+        """Checks if two teams exist and are in the same group, in one lookup request."""
+        teams = self.get_teams([name1, name2])
+        if name1 not in teams or name2 not in teams:
+            return False
+        return teams[name1]["group"] == teams[name2]["group"]
 
-    def delete_all_teams(self):
+    def delete_all_teams(self) -> bool:
         """Deletes all teams by making a DELETE request to the team service API."""
         try:
-            response = requests.delete(f"{self.team_service_url}/teams")
+            response = self.http.delete("/teams")
             response.raise_for_status()
             print("All teams deleted successfully.")
+            return True
         except RequestException as e:
             print(f"Failed to delete all teams. Error: {e}")
+            return False
@@ -0,0 +1,62 @@
+"""Compares two suite.py result files and lists what got slower.
+
+Every flow time, endpoint throughput and p50/p99 latency present in both
+files is printed with its relative change; changes worse than --threshold
+percent are marked, and make the exit status 1 so a script can fail on them.
+
+    python benchmarks/compare.py benchmarks/results/before.json benchmarks/results/after.json
+"""
+import argparse
+import json
+import sys
+
+# Metric -> whether a higher value is better
+METRICS = {"seconds": False, "requests_per_second": True, "p50_ms": False, "p99_ms": False}
+
+
+def measurements(report: dict) -> dict:
+    """Flattens a report to {(teams, kind, name, metric): value}."""
+    values = {}
+    for size in report["sizes"]:
+        for name, result in size["flows"].items():
+            if isinstance(result, dict):
+                for metric in ("p50_ms", "p99_ms"):
+                    values[(size["teams"], "flow", name, metric)] = result[metric]
+            else:
+                values[(size["teams"], "flow", name, "seconds")] = result
+        for name, result in size["endpoints"].items():
+            for metric in ("requests_per_second", "p50_ms", "p99_ms"):
+                values[(size["teams"], "endpoint", name, metric)] = result[metric]
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent change counted as a regression")
+    args = parser.parse_args()
+
+    with open(args.base) as base_file, open(args.new) as new_file:
+        base, new = json.load(base_file), json.load(new_file)
+    print(f"base {base['commit'][:12]}  new {new['commit'][:12]}\n")
+
+    base_values, new_values = measurements(base), measurements(new)
+    regressions = 0
+    for key in sorted(base_values.keys() & new_values.keys()):
+        teams, kind, name, metric = key
+        before, after = base_values[key], new_values[key]
+        change = (after - before) / before * 100 if before else 0.0
+        worse = -change if METRICS[metric] else change
+        flag = ""
+        if worse > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{teams:>7} {kind:<8} {name:<20} {metric:<20} {before:12.2f} {after:12.2f} {change:+8.1f}%{flag}")
+
+    print(f"\n{regressions} regression(s) over {args.threshold:g}%")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
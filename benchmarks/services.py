@@ -0,0 +1,88 @@
+"""Runs the four services in this process, on SQLite files, for benchmarking.
+
+Every service is a top-level `main` module with its own `database` package,
+so each one is imported in isolation and served by uvicorn on a thread.
+"""
+import importlib
+import os
+import socket
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import uvicorn
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SERVICES = ["team_service", "match_service", "ranking_service", "logging_service"]
+# Environment variable through which the app and the other services find each service
+URL_SETTINGS = {
+    "team_service": "TEAM_SERVICE_URL",
+    "match_service": "MATCH_SERVICE_URL",
+    "ranking_service": "RANKING_SERVICE_URL",
+    "logging_service": "LOG_SERVICE_URL",
+}
+DATABASE_SERVICES = {"team_service", "match_service", "logging_service"}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _forget_service_modules():
+    # Only the names several services use; the others stay importable, as the
+    # ranking service's worker processes are handed functions by module name
+    for name in [name for name in sys.modules if name in ("main", "database", "metrics", "tracing", "wire") or name.startswith("database.")]:
+        del sys.modules[name]
+
+
+def load_service(service: str, database_url: str = None):
+    """Imports a service's main module under its own name, with DATABASE_URL set for it."""
+    if database_url:
+        os.environ["DATABASE_URL"] = database_url
+    _forget_service_modules()
+    sys.path.insert(0, os.path.join(ROOT, service))
+    try:
+        module = importlib.import_module("main")
+    finally:
+        sys.path.pop(0)
+        _forget_service_modules()
+    sys.modules[f"{service}_main"] = module
+    return module
+
+
+@contextmanager
+def running_services(directory: str):
+    """Starts all four services on free ports and yields their base URLs by service name.
+
+    The *_SERVICE_URL variables are set for the duration, so the services
+    and the app's managers talk to these instances.
+    """
+    urls = {service: f"http://127.0.0.1:{free_port()}" for service in SERVICES}
+    previous = {name: os.environ.get(name) for name in [*URL_SETTINGS.values(), "DATABASE_URL"]}
+    os.environ.update({URL_SETTINGS[service]: url for service, url in urls.items()})
+
+    servers = []
+    try:
+        for service in SERVICES:
+            database_url = f"sqlite:///{directory}/{service}.db" if service in DATABASE_SERVICES else None
+            module = load_service(service, database_url)
+            port = int(urls[service].rsplit(":", 1)[1])
+            server = uvicorn.Server(uvicorn.Config(module.app, host="127.0.0.1", port=port, log_level="warning"))
+            threading.Thread(target=server.run, name=service, daemon=True).start()
+            servers.append(server)
+        while not all(server.started for server in servers):
+            time.sleep(0.05)
+        yield urls
+    finally:
+        for server in servers:
+            server.should_exit = True
+        for thread in [thread for thread in threading.enumerate() if thread.name in SERVICES]:
+            thread.join(timeout=10)
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
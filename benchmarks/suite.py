@@ -0,0 +1,270 @@
+"""Load and latency benchmarks for all four services and the TournamentApp flows.
+
+For every tournament size, the services are started in this process on fresh
+SQLite files (see services.py) and a synthetic tournament is generated: teams
+in groups of --group-size, each group playing a full round robin with seeded
+random scores. The app's own flows then enter it, and are timed:
+
+    input_teams     bulk team input (_input_teams)
+    input_matches   bulk match input (_input_matches)
+    rankings        display rankings (_display_rankings)
+    rename          one edit team line that renames a team (_edit_team), per rename
+
+after which each endpoint is sent --requests requests from --concurrency
+clients and its throughput and p50/p99 latency recorded. Client and services
+share one process, so absolute numbers are best compared between runs on the
+same machine. Results are written as JSON to benchmarks/results/; compare two
+runs with compare.py.
+
+    python benchmarks/suite.py --sizes 10,1000
+    python benchmarks/suite.py --output before.json
+"""
+import argparse
+import asyncio
+import builtins
+import contextlib
+import datetime
+import importlib
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from services import ROOT, running_services
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+DEFAULT_SIZES = "10,100,1000,10000,100000"
+# Whole-tournament endpoints are much slower, so they get fewer requests
+HEAVY_ENDPOINTS = {"rankings_calculate", "rankings_refresh", "rankings_qualification"}
+
+
+def tournament(teams: int, group_size: int, seed: int):
+    """Teams in consecutive groups of group_size, and a round robin of matches in each group."""
+    rng = random.Random(seed)
+    team_rows = [
+        {"name": f"team{i}", "date": f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}", "group": i // group_size + 1}
+        for i in range(teams)
+    ]
+    match_rows = []
+    for start in range(0, teams, group_size):
+        members = team_rows[start:start + group_size]
+        for position, team_a in enumerate(members):
+            for team_b in members[position + 1:]:
+                match_rows.append({
+                    "team_a": team_a["name"],
+                    "team_b": team_b["name"],
+                    "goals_a": rng.randint(0, 4),
+                    "goals_b": rng.randint(0, 4),
+                })
+    return team_rows, match_rows
+
+
+def percentile(latencies: list, q: float) -> float:
+    # Nearest rank: the smallest sample with at least a fraction q of the samples at or below it
+    return latencies[max(0, math.ceil(len(latencies) * q) - 1)]
+
+
+def summarize(latencies: list, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "seconds": elapsed,
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+def load_app():
+    """Imports the CLI's main module (TournamentApp) from app/."""
+    sys.path.insert(0, os.path.join(ROOT, "app"))
+    sys.modules.pop("main", None)
+    try:
+        return importlib.import_module("main")
+    finally:
+        sys.path.pop(0)
+        sys.modules.pop("main", None)
+
+
+@contextlib.contextmanager
+def scripted_input(lines):
+    """Feeds the lines, then an empty line, to input(); the app's own output is discarded."""
+    answers = iter([*lines, ""])
+    original = builtins.input
+    builtins.input = lambda *args: next(answers)
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            yield
+    finally:
+        builtins.input = original
+
+
+def timed(flow, lines=()) -> float:
+    with scripted_input(lines):
+        started = time.perf_counter()
+        flow()
+        return time.perf_counter() - started
+
+
+def run_flows(app_main, teams: list, matches: list, renames: int) -> dict:
+    app = app_main.TournamentApp(
+        app_main.AsyncTeamManager(),
+        app_main.AsyncMatchManager(),
+        app_main.RankingManager(),
+        app_main.LoggingManager()
+    )
+    try:
+        app._sync_rankings()
+        results = {
+            "input_teams": timed(app._input_teams, [f"{t['name']} {t['date']} {t['group']}" for t in teams]),
+            "input_matches": timed(app._input_matches, [f"{m['team_a']} {m['team_b']} {m['goals_a']} {m['goals_b']}" for m in matches]),
+            "rankings": timed(app._display_rankings),
+        }
+        # Each renamed team is renamed back, so the endpoints below see the generated tournament
+        latencies = []
+        started = time.perf_counter()
+        for team in teams[:renames]:
+            renamed = f"{team['name']}-renamed"
+            latencies.append(timed(app._edit_team, [f"{team['name']} {renamed} {team['date']} {team['group']}"]))
+            latencies.append(timed(app._edit_team, [f"{renamed} {team['name']} {team['date']} {team['group']}"]))
+        if latencies:
+            results["rename"] = summarize(latencies, time.perf_counter() - started)
+        return results
+    finally:
+        app.logging_manager.close()
+        app._run(app.team_manager.http.close(), app.match_manager.http.close())
+        app._loop.close()
+
+
+def endpoint_requests(urls: dict, teams: list, matches: list) -> dict:
+    """Builds each benchmarked request from a seeded RNG: name -> rng -> (method, url, kwargs)."""
+    team_url, match_url = urls["team_service"], urls["match_service"]
+    ranking_url, log_url = urls["ranking_service"], urls["logging_service"]
+    rankings_input = {
+        "teams": teams,
+        "matches": [{**match, "id": match_id} for match_id, match in enumerate(matches, start=1)],
+    }
+
+    def team_name(rng):
+        return rng.choice(teams)["name"]
+
+    def pair(rng):
+        match = rng.choice(matches)
+        return f"{match_url}/matches/{match['team_a']}/{match['team_b']}"
+
+    def log_batch(rng):
+        now = datetime.datetime.now().isoformat()
+        return [{"message": f"benchmark {rng.random()}", "timestamp": now} for _ in range(100)]
+
+    return {
+        "team_read": lambda rng: ("GET", f"{team_url}/teams/{team_name(rng)}", {}),
+        "team_names": lambda rng: ("GET", f"{team_url}/teams", {"params": {"names": [team_name(rng) for _ in range(10)]}}),
+        "match_pair": lambda rng: ("GET", pair(rng), {}),
+        "match_page": lambda rng: ("GET", f"{match_url}/matches", {"params": {"after_id": rng.randrange(len(matches)), "limit": 100}}),
+        "log_batch": lambda rng: ("POST", f"{log_url}/logs/batch", {"json": log_batch(rng)}),
+        "log_page": lambda rng: ("GET", f"{log_url}/logs", {"params": {"limit": 100}}),
+        "rankings_state": lambda rng: ("GET", f"{ranking_url}/rankings", {}),
+        "rankings_top4": lambda rng: ("GET", f"{ranking_url}/rankings", {"params": {"limit": 4}}),
+        "team_rank": lambda rng: ("GET", f"{ranking_url}/rankings/team/{team_name(rng)}", {}),
+        "rankings_refresh": lambda rng: ("GET", f"{ranking_url}/rankings", {"params": {"source": "services"}}),
+        "rankings_calculate": lambda rng: ("POST", f"{ranking_url}/rankings", {"json": rankings_input}),
+        # Half the group stage played; the other half simulated
+        "rankings_qualification": lambda rng: ("POST", f"{ranking_url}/rankings/qualification", {
+            "params": {"simulations": 10000, "seed": 1},
+            "json": {"teams": teams, "matches": matches[::2]},
+        }),
+    }
+
+
+async def measure(client: httpx.AsyncClient, make_request, requests: int, concurrency: int) -> dict:
+    latencies = []
+    remaining = iter(range(requests))
+
+    async def worker(worker_id: int):
+        rng = random.Random(worker_id)
+        for _ in remaining:
+            method, url, kwargs = make_request(rng)
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(worker_id) for worker_id in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def run_endpoints(urls: dict, teams: list, matches: list, args) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(limits=limits, timeout=600) as client:
+        for name, make_request in endpoint_requests(urls, teams, matches).items():
+            if name in HEAVY_ENDPOINTS:
+                results[name] = await measure(client, make_request, args.heavy_requests, 1)
+            else:
+                results[name] = await measure(client, make_request, args.requests, args.concurrency)
+    return results
+
+
+def benchmark_size(app_main, size: int, args) -> dict:
+    teams, matches = tournament(size, args.group_size, args.seed)
+    with tempfile.TemporaryDirectory() as directory, running_services(directory) as urls:
+        flows = run_flows(app_main, teams, matches, min(args.renames, size // 2))
+        endpoints = asyncio.run(run_endpoints(urls, teams, matches, args))
+    return {"teams": len(teams), "matches": len(matches), "flows": flows, "endpoints": endpoints}
+
+
+def git_commit() -> str:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, capture_output=True, text=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if dirty.strip() else commit
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"comma-separated team counts (default {DEFAULT_SIZES})")
+    parser.add_argument("--group-size", type=int, default=6)
+    parser.add_argument("--requests", type=int, default=2000, help="requests per endpoint")
+    parser.add_argument("--heavy-requests", type=int, default=5, help="requests per whole-tournament ranking endpoint")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--renames", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="result file (default benchmarks/results/<timestamp>-<commit>.json)")
+    args = parser.parse_args()
+
+    # The app logs every team and match it adds; queue them all instead of dropping past 10000
+    os.environ.setdefault("LOG_QUEUE_SIZE", "1000000")
+    app_main = load_app()
+    commit = git_commit()
+    started = datetime.datetime.now(datetime.timezone.utc)
+    report = {
+        "commit": commit,
+        "started": started.isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {key: value for key, value in vars(args).items() if key != "output"},
+        "sizes": [],
+    }
+    for size in [int(size) for size in args.sizes.split(",")]:
+        print(f"{size} teams...", file=sys.stderr)
+        report["sizes"].append(benchmark_size(app_main, size, args))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{started:%Y%m%dT%H%M%S}-{commit[:12]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as result_file:
+        json.dump(report, result_file, indent=2)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Breaks traced app actions down by hop, from the TRACE_FILE span files.
+
+Pass the app's span file together with the services' (or one file they all
+append to). For each action, newest last, the report lists the time spent
+per hop, summed over its calls, and the slowest single call.
+
+    python benchmarks/trace_report.py app-spans.jsonl services-spans.jsonl
+    python benchmarks/trace_report.py spans.jsonl --correlation-id 3f2a...
+"""
+import argparse
+import json
+from collections import defaultdict
+
+
+def read_spans(paths: list) -> dict:
+    """Spans grouped by correlation ID."""
+    traces = defaultdict(list)
+    for path in paths:
+        with open(path) as span_file:
+            for line in span_file:
+                if line.strip():
+                    span = json.loads(line)
+                    traces[span["correlation_id"]].append(span)
+    return traces
+
+
+def report(correlation: str, spans: list):
+    roots = [span for span in spans if span["parent_id"] is None and span["service"] == "app"]
+    if not roots:
+        return
+    root = roots[0]
+    print(f"{root['name']} ({correlation}): {root['duration_ms']:.1f} ms")
+
+    hops = defaultdict(lambda: [0, 0.0])
+    for span in spans:
+        if span is root:
+            continue
+        hop = hops[(span["service"], span["name"])]
+        hop[0] += 1
+        hop[1] += span["duration_ms"]
+    for (service, name), (calls, total) in sorted(hops.items(), key=lambda item: -item[1][1]):
+        print(f"  {service:<16} {name:<40} {calls:>6} calls {total:10.1f} ms")
+
+    slowest = max((span for span in spans if span is not root), key=lambda span: span["duration_ms"], default=None)
+    if slowest is not None:
+        print(f"  slowest: {slowest['service']} {slowest['name']} {slowest['duration_ms']:.1f} ms {slowest['attributes']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--correlation-id", help="report only this action")
+    args = parser.parse_args()
+
+    traces = read_spans(args.files)
+    if args.correlation_id:
+        traces = {args.correlation_id: traces.get(args.correlation_id, [])}
+    for correlation, spans in sorted(traces.items(), key=lambda item: min(span["start"] for span in item[1]) if item[1] else 0):
+        if correlation is not None:
+            report(correlation, spans)
+
+
+if __name__ == "__main__":
+    main()
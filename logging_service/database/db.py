@@ -1,29 +1,250 @@
 import os
+import fcntl
+import re
 
-from sqlalchemy import create_engine, Column, Integer, String, DateTime
-from sqlalchemy.ext.declarative import declarative_base
+from contextlib import asynccontextmanager, contextmanager
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, Index, MetaData, Table, inspect, select, insert, func, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker, Session
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, timedelta
+from metrics import instrument_engine
+from tracing import span, trace_statements
+from typing import List, Optional, Union
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# DB_ASYNC=1 serves requests from an async engine (asyncpg or aiosqlite) instead of the threadpool
+DB_ASYNC = os.getenv("DB_ASYNC", "0") == "1"
+# Async drivers used for each sync DATABASE_URL dialect
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+# Logs are stored in one table per time bucket: logs_YYYYMM, or logs_YYYYMMDD with LOG_BUCKET=day
+LOG_BUCKET = os.getenv("LOG_BUCKET", "month")
+# Buckets that end more than this many days ago are dropped; 0 keeps logs forever
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "0"))
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
+def async_database_url(url: str) -> str:
+    dialect, rest = url.split("://", 1)
+    return f"{ASYNC_DRIVERS[dialect.split('+')[0]]}://{rest}"
 
-class Log(Base):
-    __tablename__ = 'logs'
-    id = Column(Integer, primary_key=True, index=True)
-    message = Column(String, nullable=False)
-    timestamp = Column(DateTime, default=datetime.now)
+# Engines are created by init_db at startup, in each worker process after it
+# has forked, so no two processes ever share a connection pool
+engine = None
+async_engine = None
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+AsyncSessionLocal = async_sessionmaker(autoflush=False) if DB_ASYNC else None
+AnySession = Union[Session, AsyncSession]
+# Connections per worker for the sync engine when requests use the async one
+SYNC_POOL_LIMIT = 2
+# Advisory lock id held while a worker runs init_db
+STARTUP_LOCK_KEY = 1004
 
-def get_db() -> Session:
-    db = SessionLocal()
-    try:
+def pool_settings(reserved: int = 0, limit: Optional[int] = None) -> dict:
+    """Connection pool options for one worker process, from the DB_POOL_* settings.
+
+    DB_MAX_CONNECTIONS, when set, is the budget for the whole service: it is
+    split across WEB_CONCURRENCY workers, less `reserved` connections per
+    worker kept for another pool, and caps pool size plus overflow. `limit`
+    caps this pool on its own.
+    """
+    settings = {
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "1") == "1",
+    }
+    if DATABASE_URL.startswith("sqlite"):
+        return settings
+    pool_size = int(os.getenv("DB_POOL_SIZE", "5"))
+    max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    per_worker = limit
+    budget = os.getenv("DB_MAX_CONNECTIONS")
+    if budget:
+        workers = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+        # Startup holds a lock connection while it migrates on another, so never less than 2
+        share = max(2, int(budget) // workers - reserved)
+        per_worker = share if per_worker is None else min(per_worker, share)
+    if per_worker is not None:
+        pool_size = min(pool_size, per_worker)
+        max_overflow = min(max_overflow, per_worker - pool_size)
+    return {**settings, "pool_size": pool_size, "max_overflow": max_overflow}
+
+def create_engines():
+    global engine, async_engine
+    if engine is not None:
+        return
+    if DB_ASYNC:
+        async_engine = create_async_engine(async_database_url(DATABASE_URL), **pool_settings(reserved=SYNC_POOL_LIMIT))
+        AsyncSessionLocal.configure(bind=async_engine)
+        instrument_engine(async_engine.sync_engine, "async")
+        trace_statements(async_engine.sync_engine)
+        # Requests go through the async engine; the sync one only runs bucket DDL, migrations and retention
+        engine = create_engine(DATABASE_URL, **pool_settings(limit=SYNC_POOL_LIMIT))
+    else:
+        engine = create_engine(DATABASE_URL, **pool_settings())
+    instrument_engine(engine, "sync")
+    trace_statements(engine)
+    SessionLocal.configure(bind=engine)
+
+async def dispose_engines():
+    if async_engine is not None:
+        await async_engine.dispose()
+    if engine is not None:
+        engine.dispose()
+
+metadata = MetaData()
+# Buckets this process knows to exist, so writes skip the existence check
+_known_buckets = set()
+
+BUCKET_FORMATS = {"month": "%Y%m", "day": "%Y%m%d"}
+BUCKET_TABLE_NAME = re.compile(r"^logs_(\d{6}|\d{8})$")
+# Single table used before logs were bucketed; migrated by init_db
+LEGACY_TABLE_NAME = "logs"
+
+if LOG_BUCKET not in BUCKET_FORMATS:
+    raise ValueError(f"LOG_BUCKET must be one of {', '.join(BUCKET_FORMATS)}")
+
+def bucket_key(timestamp: datetime) -> str:
+    return timestamp.strftime(BUCKET_FORMATS[LOG_BUCKET])
+
+def bucket_start(key: str) -> datetime:
+    return datetime.strptime(key, BUCKET_FORMATS["month"] if len(key) == 6 else BUCKET_FORMATS["day"])
+
+def bucket_end(key: str) -> datetime:
+    start = bucket_start(key)
+    if len(key) == 8:
+        return start + timedelta(days=1)
+    return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+
+def log_table(key: str) -> Table:
+    name = f"logs_{key}"
+    if name in metadata.tables:
+        return metadata.tables[name]
+    return Table(
+        name,
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("message", String, nullable=False),
+        Column("timestamp", DateTime, default=datetime.now),
+        # Serves newest-first reads and (timestamp, id) keyset pagination
+        Index(f"ix_{name}_timestamp_id", "timestamp", "id")
+    )
+
+def ensure_bucket(key: str, bind=None) -> Table:
+    """Returns the bucket's table, creating it on first use."""
+    bind = engine if bind is None else bind
+    table = log_table(key)
+    if key not in _known_buckets:
+        try:
+            table.create(bind=bind, checkfirst=True)
+        except SQLAlchemyError:
+            # Another process created it between the check and the CREATE
+            if not inspect(bind).has_table(table.name):
+                raise
+        _known_buckets.add(key)
+    return table
+
+def existing_buckets(since: Optional[datetime] = None, until: Optional[datetime] = None, bind=None) -> List[str]:
+    """Keys of the buckets overlapping [since, until], newest first."""
+    bind = engine if bind is None else bind
+    keys = []
+    for name in inspect(bind).get_table_names():
+        match = BUCKET_TABLE_NAME.match(name)
+        if not match:
+            continue
+        key = match.group(1)
+        if since is not None and bucket_end(key) <= since:
+            continue
+        if until is not None and bucket_start(key) > until:
+            continue
+        keys.append(key)
+    return sorted(keys, key=bucket_start, reverse=True)
+
+def drop_expired_buckets(now: Optional[datetime] = None) -> List[str]:
+    """Drops whole buckets that ended before the retention window."""
+    if LOG_RETENTION_DAYS <= 0:
+        return []
+    cutoff = (now or datetime.now()) - timedelta(days=LOG_RETENTION_DAYS)
+    dropped = []
+    for key in existing_buckets():
+        if bucket_end(key) <= cutoff:
+            log_table(key).drop(bind=engine, checkfirst=True)
+            _known_buckets.discard(key)
+            dropped.append(key)
+    return dropped
+
+@asynccontextmanager
+async def open_session():
+    """An AsyncSession with DB_ASYNC=1, a sync Session otherwise."""
+    if DB_ASYNC:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(db.close)
+
+async def run_db(db: AnySession, fn, *args):
+    """Runs fn(session, *args), a plain sync function, without blocking the event loop.
+
+    An AsyncSession runs it on its async connection through run_sync; a sync
+    Session runs it in the threadpool. Endpoint logic is written once for both.
+    Each call is a span of the request's trace.
+    """
+    with span("db", function=fn.__qualname__):
+        if isinstance(db, AsyncSession):
+            return await db.run_sync(fn, *args)
+        return await run_in_threadpool(fn, db, *args)
+
+async def get_db() -> AnySession:
+    async with open_session() as db:
         yield db
-    finally:
-        db.close()
+
+@contextmanager
+def startup_lock():
+    """Serializes init_db across worker processes.
+
+    PostgreSQL uses an advisory lock; SQLite, which has none, a file lock
+    next to the database file.
+    """
+    if engine.dialect.name == "sqlite":
+        if engine.url.database in (None, "", ":memory:"):
+            yield
+            return
+        with open(f"{engine.url.database}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return
+    with engine.connect() as connection:
+        connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": STARTUP_LOCK_KEY})
+        try:
+            yield
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": STARTUP_LOCK_KEY})
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    create_engines()
+    # Workers starting together take turns, so schema changes run one at a time
+    with startup_lock():
+        _known_buckets.update(existing_buckets())
+        if not inspect(engine).has_table(LEGACY_TABLE_NAME):
+            return
+
+        # Move rows from the old single table into their buckets, then drop it
+        legacy = Table(LEGACY_TABLE_NAME, MetaData(), autoload_with=engine)
+        with engine.begin() as connection:
+            oldest, newest = connection.execute(select(func.min(legacy.c.timestamp), func.max(legacy.c.timestamp))).one()
+            key = bucket_key(oldest) if oldest else None
+            while key is not None and bucket_start(key) <= newest:
+                table = ensure_bucket(key, connection)
+                rows = select(legacy.c.message, legacy.c.timestamp).where(
+                    legacy.c.timestamp >= bucket_start(key),
+                    legacy.c.timestamp < bucket_end(key)
+                )
+                connection.execute(insert(table).from_select(["message", "timestamp"], rows))
+                key = bucket_key(bucket_end(key))
+            legacy.drop(bind=connection)
+
@@ -4,4 +4,7 @@ from pydantic import BaseModel
 
 class LogEntry(BaseModel):
     message: str
-    timestamp: datetime
\ No newline at end of file
+    timestamp: datetime
+
+class LogRecord(LogEntry):
+    id: int
\ No newline at end of file
@@ -1,26 +1,156 @@
-from fastapi import FastAPI, Depends, HTTPException
+import json
+import threading
+from datetime import datetime
+from fastapi import FastAPI, Depends, HTTPException, Response, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, insert, or_, and_
 from sqlalchemy.orm import Session
-from database.db import get_db, init_db, Log
-from database.models import LogEntry
-from typing import List
+from database.db import (
+    get_db, init_db, dispose_engines, run_db, SessionLocal, AsyncSessionLocal, AnySession, ensure_bucket, existing_buckets,
+    drop_expired_buckets, log_table, bucket_key, DB_ASYNC, LOG_RETENTION_DAYS
+)
+from database.models import LogEntry, LogRecord
+from metrics import instrument_app, mark_worker_stopped
+import tracing
+import wire
+from typing import List, Optional
 
-app = FastAPI()
+# Bodies are negotiated: MessagePack or JSON, and compressed when the client accepts it
+app = FastAPI(default_response_class=wire.NegotiatedResponse)
+app.router.route_class = wire.WireRoute
+instrument_app(app)
+tracing.instrument_app(app)
+app.add_middleware(wire.CompressionMiddleware)
+
+# Seconds between checks for buckets that fell out of the retention window
+RETENTION_CHECK_INTERVAL = 3600
+retention_stopped = threading.Event()
+
+def enforce_retention():
+    while not retention_stopped.is_set():
+        try:
+            dropped = drop_expired_buckets()
+            if dropped:
+                print(f"Dropped expired log buckets: {', '.join(dropped)}")
+        except Exception as e:
+            print(f"Error dropping expired log buckets: {e}")
+        retention_stopped.wait(RETENTION_CHECK_INTERVAL)
 
 
 @app.on_event("startup")
 def on_startup():
     # Initialize the database (create tables if they don't exist)
     init_db()
+    if LOG_RETENTION_DAYS > 0:
+        threading.Thread(target=enforce_retention, name="log-retention", daemon=True).start()
 
-@app.post("/logs")
-def create_log(log: LogEntry, db: Session = Depends(get_db)):
-    db_log = Log(message=log.message, timestamp=log.timestamp)
-    db.add(db_log)
+@app.on_event("shutdown")
+async def on_shutdown():
+    retention_stopped.set()
+    await dispose_engines()
+    mark_worker_stopped()
+
+def insert_logs(db: Session, logs: List[LogEntry]):
+    rows = {}
+    for log in logs:
+        rows.setdefault(bucket_key(log.timestamp), []).append({"message": log.message, "timestamp": log.timestamp})
+    # Create any missing buckets before the session starts writing. This goes
+    # through the sync engine, which only blocks on a bucket's first write.
+    tables = {key: ensure_bucket(key) for key in rows}
+    for key, bucket_rows in rows.items():
+        db.execute(insert(tables[key]), bucket_rows)
     db.commit()
-    db.refresh(db_log)
+
+# Endpoints are async; their database work is a sync function handed to run_db,
+# which runs it on the async engine with DB_ASYNC=1 or in the threadpool otherwise
+
+@app.post("/logs")
+async def create_log(log: LogEntry, db: AnySession = Depends(get_db)):
+    await run_db(db, insert_logs, [log])
     return {"status": "success"}
 
-@app.get("/logs", response_model=List[LogEntry])
-def get_logs(db: Session = Depends(get_db)):
-    logs = db.query(Log).order_by(Log.timestamp.desc()).all()
-    return [{"message": log.message, "timestamp": log.timestamp} for log in logs]
\ No newline at end of file
+@app.post("/logs/batch")
+async def create_logs(logs: List[LogEntry], db: AnySession = Depends(get_db)):
+    # One multi-row INSERT per bucket and one commit for the whole batch
+    if logs:
+        await run_db(db, insert_logs, logs)
+    return {"status": "success", "count": len(logs)}
+
+# Rows fetched per round trip when streaming from a server-side cursor
+STREAM_BATCH_SIZE = 1000
+
+def parse_cursor(before: str):
+    """Parses a '<ISO timestamp>,<id>' keyset cursor."""
+    try:
+        timestamp, log_id = before.rsplit(',', 1)
+        return datetime.fromisoformat(timestamp), int(log_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="before must be '<ISO timestamp>,<id>'")
+
+def newest_first(key: str, cursor, since: Optional[datetime]):
+    """Query for one bucket's rows, newest first, after the cursor and not older than since."""
+    table = log_table(key)
+    query = select(table.c.id, table.c.message, table.c.timestamp).order_by(table.c.timestamp.desc(), table.c.id.desc())
+    if cursor:
+        timestamp, log_id = cursor
+        query = query.where(or_(table.c.timestamp < timestamp, and_(table.c.timestamp == timestamp, table.c.id < log_id)))
+    if since:
+        query = query.where(table.c.timestamp >= since)
+    return query
+
+def buckets_for(db: Session, cursor, since: Optional[datetime]) -> List[str]:
+    # Only buckets inside the requested time range are read
+    return existing_buckets(since=since, until=cursor[0] if cursor else None, bind=db.connection())
+
+def log_line(row) -> str:
+    return json.dumps({"id": row.id, "message": row.message, "timestamp": row.timestamp.isoformat()}) + "\n"
+
+# The request's session is closed before streaming starts, so the streams use their own
+
+def stream_logs(cursor, since: Optional[datetime]):
+    db = SessionLocal()
+    try:
+        for key in buckets_for(db, cursor, since):
+            rows = db.execute(newest_first(key, cursor, since), execution_options={"stream_results": True, "yield_per": STREAM_BATCH_SIZE})
+            for row in rows:
+                yield log_line(row)
+    finally:
+        db.close()
+
+async def stream_logs_async(cursor, since: Optional[datetime]):
+    async with AsyncSessionLocal() as db:
+        for key in await db.run_sync(buckets_for, cursor, since):
+            rows = await db.stream(newest_first(key, cursor, since).execution_options(yield_per=STREAM_BATCH_SIZE))
+            async for row in rows:
+                yield log_line(row)
+
+def read_page(db: Session, cursor, since: Optional[datetime], limit: Optional[int]) -> list:
+    logs = []
+    for key in buckets_for(db, cursor, since):
+        query = newest_first(key, cursor, since)
+        if limit is not None:
+            query = query.limit(limit - len(logs))
+        logs.extend(db.execute(query))
+        if limit is not None and len(logs) >= limit:
+            break
+    return logs
+
+@app.get("/logs", response_model=List[LogRecord])
+async def get_logs(
+    response: Response,
+    before: Optional[str] = None,
+    since: Optional[datetime] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    stream: bool = False,
+    db: AnySession = Depends(get_db)
+):
+    cursor = parse_cursor(before) if before else None
+    if stream:
+        rows = stream_logs_async(cursor, since) if DB_ASYNC else stream_logs(cursor, since)
+        return StreamingResponse(rows, media_type="application/x-ndjson")
+
+    logs = await run_db(db, read_page, cursor, since, limit)
+    if limit is not None and len(logs) == limit:
+        # Cursor for the next, older page
+        response.headers["X-Next-Before"] = f"{logs[-1].timestamp.isoformat()},{logs[-1].id}"
+    return [{"id": log.id, "message": log.message, "timestamp": log.timestamp} for log in logs]
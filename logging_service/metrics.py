@@ -0,0 +1,94 @@
+"""Prometheus metrics for the service, served at GET /metrics.
+
+With several uvicorn workers, PROMETHEUS_MULTIPROC_DIR makes every scrape
+add up the samples of all workers; without it, a scrape only shows the
+worker that answered it.
+"""
+import os
+import time
+
+# The multiprocess directory must exist before prometheus_client is imported
+if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+from fastapi import FastAPI, Request, Response
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+from sqlalchemy import event
+from starlette.routing import Match
+
+# The service's own registry, so nothing else in the process shows up in /metrics
+registry = CollectorRegistry()
+
+REQUESTS = Counter("http_requests_total", "HTTP requests handled", ["method", "route", "status"], registry=registry)
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "Time to handle an HTTP request, up to its response headers", ["method", "route"], registry=registry)
+IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being handled", ["method", "route"], registry=registry, multiprocess_mode="livesum")
+
+STATEMENT_SECONDS = Histogram("db_statement_duration_seconds", "Time to execute a SQL statement", ["engine", "operation"], registry=registry)
+POOL_SIZE = Gauge("db_pool_max_connections", "Connections the pool may open (pool size plus overflow)", ["engine"], registry=registry, multiprocess_mode="livesum")
+POOL_OPEN = Gauge("db_pool_connections_open", "Database connections the pool holds open", ["engine"], registry=registry, multiprocess_mode="livesum")
+POOL_CHECKED_OUT = Gauge("db_pool_connections_checked_out", "Pooled connections in use", ["engine"], registry=registry, multiprocess_mode="livesum")
+
+def route_of(app: FastAPI, scope) -> str:
+    """The path template of the route a request goes to, so /teams/{name} is one series, not one per team."""
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+def metrics_response() -> Response:
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        scraped = CollectorRegistry()
+        multiprocess.MultiProcessCollector(scraped)
+    else:
+        scraped = registry
+    return Response(generate_latest(scraped), media_type=CONTENT_TYPE_LATEST)
+
+def instrument_app(app: FastAPI):
+    """Serves /metrics and records every request. Call it after the app's own middleware, such as
+    the ETag check, so it sees responses they short-circuit, and before tracing.instrument_app.
+    Requests then pass through compression, tracing, metrics and the ETag check, in that order."""
+    @app.middleware("http")
+    async def record_request(request: Request, call_next):
+        if request.url.path == "/metrics":
+            return metrics_response()
+        method, route = request.method, route_of(app, request.scope)
+        in_flight = IN_FLIGHT.labels(method, route)
+        in_flight.inc()
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            in_flight.dec()
+            REQUEST_SECONDS.labels(method, route).observe(time.perf_counter() - started)
+            REQUESTS.labels(method, route, str(status)).inc()
+
+def instrument_engine(engine, name: str):
+    """Times every statement `engine` runs and tracks its pool, through engine events."""
+    pool = engine.pool
+    if hasattr(pool, "size"):
+        POOL_SIZE.labels(name).set(pool.size() + max(pool._max_overflow, 0))
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        operation = statement.split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        STATEMENT_SECONDS.labels(name, operation).observe(time.perf_counter() - context._metrics_started)
+
+    open_connections = POOL_OPEN.labels(name)
+    checked_out = POOL_CHECKED_OUT.labels(name)
+    event.listen(engine, "connect", lambda dbapi_connection, record: open_connections.inc())
+    event.listen(engine, "close", lambda dbapi_connection, record: open_connections.dec())
+    event.listen(engine, "checkout", lambda dbapi_connection, record, proxy: checked_out.inc())
+    event.listen(engine, "checkin", lambda dbapi_connection, record: checked_out.dec())
+
+def mark_worker_stopped():
+    # Drops this process's live gauges from the multiprocess totals
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(os.getpid())
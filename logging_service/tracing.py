@@ -0,0 +1,110 @@
+"""Correlation IDs and spans for the requests the service handles.
+
+Every request runs under the X-Correlation-ID it came with (or a new one),
+which is sent on with calls to other services and returned in the response.
+Timed spans (the request, each run_db call, each call out) are kept in memory
+for GET /spans?correlation_id=... and, with TRACE_FILE set, appended to that
+file as JSON lines, so one action can be followed across the services.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+
+from metrics import route_of
+
+SERVICE = "logging_service"
+CORRELATION_HEADER = "X-Correlation-ID"
+
+correlation_id: ContextVar[Optional[str]] = ContextVar("correlation_id", default=None)
+current_span: ContextVar[Optional[dict]] = ContextVar("current_span", default=None)
+
+class SpanExporter:
+    """Keeps the last TRACE_BUFFER_SIZE spans and appends every span to TRACE_FILE, if set."""
+
+    def __init__(self, path: Optional[str], max_spans: int):
+        self.path = path
+        self.spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def export(self, span: dict):
+        self.spans.append(span)
+        if self.path:
+            line = json.dumps(span) + "\n"
+            with self._lock, open(self.path, "a") as trace_file:
+                trace_file.write(line)
+
+    def find(self, correlation: str) -> list:
+        return [span for span in list(self.spans) if span["correlation_id"] == correlation]
+
+exporter = SpanExporter(os.getenv("TRACE_FILE"), int(os.getenv("TRACE_BUFFER_SIZE", "10000")))
+
+@contextmanager
+def span(name: str, **attributes):
+    """Times the block as a child of the current span; yields the span's attributes for adding to."""
+    parent = current_span.get()
+    record = {
+        "correlation_id": correlation_id.get(),
+        "span_id": uuid.uuid4().hex[:16],
+        "parent_id": parent["span_id"] if parent else None,
+        "service": SERVICE,
+        "name": name,
+        "start": time.time(),
+        "attributes": attributes,
+    }
+    token = current_span.set(record)
+    started = time.perf_counter()
+    try:
+        yield attributes
+    finally:
+        record["duration_ms"] = (time.perf_counter() - started) * 1000
+        current_span.reset(token)
+        exporter.export(record)
+
+def outgoing_headers() -> dict:
+    """Headers that carry the current correlation ID on to another service."""
+    correlation = correlation_id.get()
+    return {CORRELATION_HEADER: correlation} if correlation else {}
+
+def instrument_app(app: FastAPI):
+    """Runs every request under its correlation ID and as a span, and serves GET /spans.
+    Call it after metrics.instrument_app and before adding the compression middleware:
+    requests then pass through compression, tracing, metrics and the ETag check, in that order."""
+    @app.middleware("http")
+    async def trace_request(request: Request, call_next):
+        if request.url.path == "/spans":
+            return JSONResponse(exporter.find(request.query_params.get("correlation_id", "")))
+        if request.url.path == "/metrics":
+            return await call_next(request)
+        token = correlation_id.set(request.headers.get(CORRELATION_HEADER) or uuid.uuid4().hex)
+        try:
+            with span(f"{request.method} {route_of(app, request.scope)}") as attributes:
+                response = await call_next(request)
+                attributes["status"] = response.status_code
+            response.headers[CORRELATION_HEADER] = correlation_id.get()
+            return response
+        finally:
+            correlation_id.reset(token)
+
+def trace_statements(engine):
+    """Counts the statements `engine` runs inside each span, and the time spent on them."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        context._trace_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        record = current_span.get()
+        if record is not None:
+            attributes = record["attributes"]
+            attributes["statements"] = attributes.get("statements", 0) + 1
+            attributes["statement_ms"] = attributes.get("statement_ms", 0.0) + (time.perf_counter() - context._trace_started) * 1000
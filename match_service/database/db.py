@@ -1,31 +1,276 @@
 import os
+import fcntl
+import uuid
 
-from sqlalchemy import create_engine, Column, Integer, String
+from contextlib import asynccontextmanager, contextmanager
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, Column, Integer, String, Index, inspect, text, update, bindparam, case, collate
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from typing import Optional
+from metrics import instrument_engine
+from tracing import span, trace_statements
+from typing import Optional, Union
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# DB_ASYNC=1 serves requests from an async engine (asyncpg or aiosqlite) instead of the threadpool
+DB_ASYNC = os.getenv("DB_ASYNC", "0") == "1"
+# Async drivers used for each sync DATABASE_URL dialect
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+def async_database_url(url: str) -> str:
+    dialect, rest = url.split("://", 1)
+    return f"{ASYNC_DRIVERS[dialect.split('+')[0]]}://{rest}"
+
+# Engines are created by init_db at startup, in each worker process after it
+# has forked, so no two processes ever share a connection pool
+engine = None
+async_engine = None
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+AsyncSessionLocal = async_sessionmaker(autoflush=False) if DB_ASYNC else None
+AnySession = Union[Session, AsyncSession]
+# Connections per worker for the sync engine when requests use the async one
+SYNC_POOL_LIMIT = 2
+# Advisory lock id held while a worker runs init_db
+STARTUP_LOCK_KEY = 1002
+# Bind parameters one statement may carry: 32767 on PostgreSQL (asyncpg included), 32766 on SQLite
+MAX_BIND_PARAMETERS = 32766
+
+def pool_settings(reserved: int = 0, limit: Optional[int] = None) -> dict:
+    """Connection pool options for one worker process, from the DB_POOL_* settings.
+
+    DB_MAX_CONNECTIONS, when set, is the budget for the whole service: it is
+    split across WEB_CONCURRENCY workers, less `reserved` connections per
+    worker kept for another pool, and caps pool size plus overflow. `limit`
+    caps this pool on its own.
+    """
+    settings = {
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "1") == "1",
+    }
+    if DATABASE_URL.startswith("sqlite"):
+        return settings
+    pool_size = int(os.getenv("DB_POOL_SIZE", "5"))
+    max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    per_worker = limit
+    budget = os.getenv("DB_MAX_CONNECTIONS")
+    if budget:
+        workers = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+        # Startup holds a lock connection while it migrates on another, so never less than 2
+        share = max(2, int(budget) // workers - reserved)
+        per_worker = share if per_worker is None else min(per_worker, share)
+    if per_worker is not None:
+        pool_size = min(pool_size, per_worker)
+        max_overflow = min(max_overflow, per_worker - pool_size)
+    return {**settings, "pool_size": pool_size, "max_overflow": max_overflow}
+
+def create_engines():
+    global engine, async_engine
+    if engine is not None:
+        return
+    if DB_ASYNC:
+        async_engine = create_async_engine(async_database_url(DATABASE_URL), **pool_settings(reserved=SYNC_POOL_LIMIT))
+        AsyncSessionLocal.configure(bind=async_engine)
+        instrument_engine(async_engine.sync_engine, "async")
+        trace_statements(async_engine.sync_engine)
+        # Requests go through the async engine; the sync one only runs startup DDL and migrations
+        engine = create_engine(DATABASE_URL, **pool_settings(limit=SYNC_POOL_LIMIT))
+    else:
+        engine = create_engine(DATABASE_URL, **pool_settings())
+    instrument_engine(engine, "sync")
+    trace_statements(engine)
+    SessionLocal.configure(bind=engine)
+
+async def dispose_engines():
+    if async_engine is not None:
+        await async_engine.dispose()
+    if engine is not None:
+        engine.dispose()
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+# Name of this service's row in collection_versions
+COLLECTION = "matches"
 
 class Match(Base):
     __tablename__ = 'matches'
 
     id = Column(Integer, primary_key=True, index=True)
-    team_a = Column(String, nullable=False)
-    team_b = Column(String, nullable=False)
+    team_a = Column(String, nullable=False, index=True)
+    team_b = Column(String, nullable=False, index=True)
     goals_a = Column(Integer, nullable=False)
     goals_b = Column(Integer, nullable=False)
+    # The two team names in sorted order, so (A, B) and (B, A) share one key
+    team_low = Column(String, nullable=False)
+    team_high = Column(String, nullable=False)
+
+    __table_args__ = (Index('ux_matches_pair', 'team_low', 'team_high', unique=True),)
+
+class CollectionVersion(Base):
+    """Change counter for the service's data, served to clients as an ETag.
+
+    The epoch is random per database, so a recreated database never reuses
+    an old tag.
+    """
+    __tablename__ = "collection_versions"
+
+    name = Column(String, primary_key=True)
+    epoch = Column(String, nullable=False)
+    version = Column(Integer, nullable=False)
+
+def pair_key(team_a: str, team_b: str) -> tuple:
+    return (team_a, team_b) if team_a <= team_b else (team_b, team_a)
+
+def pair_key_columns(team_a, team_b, dialect: str) -> tuple:
+    """pair_key as SQL expressions over two name expressions, for updates done in the database.
+
+    PostgreSQL compares strings by the database's collation; "C" orders them
+    by code point, as Python does. SQLite already compares them that way.
+    """
+    low_first = (collate(team_a, "C") if dialect == "postgresql" else team_a) <= team_b
+    return case((low_first, team_a), else_=team_b), case((low_first, team_b), else_=team_a)
+
+def match_row(match: dict) -> dict:
+    """Column values for a match, including its unordered pair key."""
+    team_low, team_high = pair_key(match["team_a"], match["team_b"])
+    return {**match, "team_low": team_low, "team_high": team_high}
 
-def get_db() -> Session:
-    db = SessionLocal()
-    try:
+def insert_ignoring_conflicts(db: Session, model, rows: list, *returning):
+    """Inserts rows in multi-row statements, skipping rows that hit a unique constraint.
+
+    Each statement carries as many rows as fit in MAX_BIND_PARAMETERS; all of
+    them run in the caller's transaction. Returns the `returning` columns of
+    the rows that were actually inserted.
+    """
+    dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+    chunk = max(1, MAX_BIND_PARAMETERS // max((len(row) for row in rows), default=1))
+    inserted = []
+    for start in range(0, len(rows), chunk):
+        statement = dialect.insert(model).values(rows[start:start + chunk]).on_conflict_do_nothing().returning(*returning)
+        inserted.extend(db.execute(statement).all())
+    return inserted
+
+def bump_version(db: Session):
+    """Marks the data as changed; call in the writing transaction, right before its commit."""
+    db.execute(
+        update(CollectionVersion)
+        .where(CollectionVersion.name == COLLECTION)
+        .values(version=CollectionVersion.version + 1)
+    )
+
+def read_etag(db: Session) -> str:
+    epoch, version = db.query(CollectionVersion.epoch, CollectionVersion.version).filter(
+        CollectionVersion.name == COLLECTION
+    ).one()
+    return f'"{epoch}-{version}"'
+
+async def current_etag() -> str:
+    async with open_session() as db:
+        return await run_db(db, read_etag)
+
+@asynccontextmanager
+async def open_session():
+    """An AsyncSession with DB_ASYNC=1, a sync Session otherwise."""
+    if DB_ASYNC:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(db.close)
+
+async def run_db(db: AnySession, fn, *args):
+    """Runs fn(session, *args), a plain sync function, without blocking the event loop.
+
+    An AsyncSession runs it on its async connection through run_sync; a sync
+    Session runs it in the threadpool. Endpoint logic is written once for both.
+    Each call is a span of the request's trace.
+    """
+    with span("db", function=fn.__qualname__):
+        if isinstance(db, AsyncSession):
+            return await db.run_sync(fn, *args)
+        return await run_in_threadpool(fn, db, *args)
+
+async def get_db() -> AnySession:
+    async with open_session() as db:
         yield db
-    finally:
-        db.close()
+
+@contextmanager
+def startup_lock():
+    """Serializes init_db across worker processes.
+
+    PostgreSQL uses an advisory lock; SQLite, which has none, a file lock
+    next to the database file.
+    """
+    if engine.dialect.name == "sqlite":
+        if engine.url.database in (None, "", ":memory:"):
+            yield
+            return
+        with open(f"{engine.url.database}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return
+    with engine.connect() as connection:
+        connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": STARTUP_LOCK_KEY})
+        try:
+            yield
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": STARTUP_LOCK_KEY})
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    create_engines()
+    # Workers starting together take turns, so schema changes run one at a time
+    with startup_lock():
+        Base.metadata.create_all(bind=engine)
+        columns = {column["name"] for column in inspect(engine).get_columns(Match.__tablename__)}
+        if "team_low" not in columns:
+            _add_pair_key()
+        _create_missing_indexes()
+        with SessionLocal() as db:
+            insert_ignoring_conflicts(db, CollectionVersion, [{"name": COLLECTION, "epoch": uuid.uuid4().hex, "version": 0}], CollectionVersion.name)
+            db.commit()
+
+def _add_pair_key():
+    # Tables created before matches had a pair key get the columns backfilled
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE matches ADD COLUMN team_low VARCHAR"))
+        connection.execute(text("ALTER TABLE matches ADD COLUMN team_high VARCHAR"))
+        rows = connection.execute(text("SELECT id, team_a, team_b FROM matches")).all()
+        if rows:
+            connection.execute(
+                update(Match.__table__).where(Match.__table__.c.id == bindparam("match_id")),
+                [
+                    dict(zip(("team_low", "team_high"), pair_key(team_a, team_b)), match_id=match_id)
+                    for match_id, team_a, team_b in rows
+                ]
+            )
+
+def _create_missing_indexes():
+    # create_all does not add indexes to tables that already exist
+    existing = {index["name"] for index in inspect(engine).get_indexes(Match.__tablename__)}
+    if "ux_matches_pair" not in existing:
+        _check_unique_pairs()
+    for index in Match.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+def _check_unique_pairs():
+    """Refuses to start on rows that repeat a team pair, as the unique pair index can't be built over them.
+
+    Without the index, inserts would never conflict and duplicate matches would be stored silently.
+    """
+    with engine.connect() as connection:
+        duplicates = connection.execute(text(
+            "SELECT team_low, team_high, COUNT(*) FROM matches"
+            " GROUP BY team_low, team_high HAVING COUNT(*) > 1 LIMIT 5"
+        )).all()
+    if duplicates:
+        pairs = ", ".join(f"'{team_low}' vs '{team_high}' ({count} matches)" for team_low, team_high, count in duplicates)
+        raise RuntimeError(
+            f"Cannot create the unique index ux_matches_pair: some team pairs have more than one match, "
+            f"e.g. {pairs}. Remove the duplicate matches and restart the match service."
+        )
\ No newline at end of file
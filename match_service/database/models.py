@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import Optional
 
 class MatchBase(BaseModel):
     team_a: str
@@ -19,4 +20,15 @@ class MatchResponse(MatchBase):
     id: int
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class MatchBulkResult(BaseModel):
+    team_a: str
+    team_b: str
+    created: bool
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+class TeamRename(BaseModel):
+    old_name: str
+    new_name: str
\ No newline at end of file
@@ -1,60 +1,248 @@
-from fastapi import FastAPI, Depends, HTTPException
+import os
+import json
+import httpx
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, or_, update, case
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from database.db import get_db, init_db, Match
-from database.models import MatchCreate, MatchUpdate, MatchResponse
-from typing import List
+from database.db import (
+    get_db, init_db, dispose_engines, run_db, insert_ignoring_conflicts, match_row, pair_key, pair_key_columns, bump_version, current_etag,
+    AnySession, SessionLocal, AsyncSessionLocal, DB_ASYNC, Match
+)
+from database.models import MatchCreate, MatchUpdate, MatchResponse, MatchBulkResult, TeamRename
+from metrics import instrument_app, mark_worker_stopped
+import tracing
+import wire
+from typing import List, Dict, Optional
 
-app = FastAPI()
+# Bodies are negotiated: MessagePack or JSON, and compressed when the client accepts it
+app = FastAPI(default_response_class=wire.NegotiatedResponse)
+app.router.route_class = wire.WireRoute
 
+TEAM_SERVICE_URL = os.getenv("TEAM_SERVICE_URL")
+# Matches accepted by one POST /matches/bulk; larger batches get a 413 and should be split
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "10000"))
+
+# Keep-alive client for validating teams against the team service
+team_client: httpx.AsyncClient = None
+
+async def lookup_team_groups(names: List[str]) -> Dict[str, int]:
+    """Returns the group of every named team that exists, in one call to the team service."""
+    if not TEAM_SERVICE_URL:
+        raise HTTPException(status_code=500, detail="TEAM_SERVICE_URL environment variable not set")
+    try:
+        with tracing.span("call team_service", path="/teams/lookup"):
+            response = await team_client.post(f"{TEAM_SERVICE_URL}/teams/lookup", json=names, headers=tracing.outgoing_headers())
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        print(f"Error looking up teams: {e}")
+        raise HTTPException(status_code=502, detail="Failed to look up teams")
+    return {team["name"]: team["group"] for team in response.json()}
+
+
+@app.middleware("http")
+async def collection_etag(request: Request, call_next):
+    # Collection GETs are tagged with the data's version; a client holding the current tag gets a
+    # bodiless 304. Single-row reads are one query anyway, so they skip the version lookup
+    if request.method != "GET" or request.url.path != "/matches":
+        return await call_next(request)
+    etag = await current_etag()
+    # MessagePack and JSON bodies share a tag, so caches must key them by Accept too
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept"})
+    response = await call_next(request)
+    if response.status_code == 200:
+        response.headers["ETag"] = etag
+        response.headers.add_vary_header("Accept")
+    return response
+
+# Added after the ETag check so its 304s are counted and traced too; compression, added last, is outermost
+instrument_app(app)
+tracing.instrument_app(app)
+app.add_middleware(wire.CompressionMiddleware)
 
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
+    global team_client
     # Initialize the database (create tables if they don't exist)
     init_db()
+    team_client = httpx.AsyncClient(timeout=httpx.Timeout(30.0, connect=5.0))
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await team_client.aclose()
+    await dispose_engines()
+    mark_worker_stopped()
+
+# Endpoints are async; their database work is a sync function handed to run_db,
+# which runs it on the async engine with DB_ASYNC=1 or in the threadpool otherwise
 
 @app.post("/matches", response_model=MatchCreate)
-def add_match(match: MatchCreate, db: Session = Depends(get_db)):
-    db_match = db .query(Match).filter(Match.team_a == match.team_a, Match.team_b == match.team_b).first()
-    if db_match:
-        raise HTTPException(status_code=400, detail="Match already exists")
-    db_match = Match(**match.dict())
-    db.add(db_match)
-    db.commit()
-    db.refresh(db_match)
-    return db_match
+async def add_match(match: MatchCreate, db: AnySession = Depends(get_db)):
+    def insert(db: Session):
+        # The unique pair index decides atomically whether the match already exists
+        inserted = insert_ignoring_conflicts(db, Match, [match_row(match.dict())], Match.id)
+        if not inserted:
+            raise HTTPException(status_code=400, detail="Match already exists")
+        bump_version(db)
+        db.commit()
+    await run_db(db, insert)
+    return match
+
+@app.post("/matches/bulk", response_model=List[MatchBulkResult])
+async def add_matches(matches: List[MatchCreate], db: AnySession = Depends(get_db)):
+    if len(matches) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ITEMS} matches can be added in one request")
+    names = list({match.team_a for match in matches} | {match.team_b for match in matches})
+    groups = await lookup_team_groups(names)
+
+    results = []
+    accepted = {}
+    for match in matches:
+        pair = pair_key(match.team_a, match.team_b)
+        if match.team_a not in groups:
+            detail = f"Team '{match.team_a}' does not exist"
+        elif match.team_b not in groups:
+            detail = f"Team '{match.team_b}' does not exist"
+        elif groups[match.team_a] != groups[match.team_b]:
+            detail = "Teams are not in the same group"
+        elif pair in accepted:
+            detail = "Match already exists"
+        else:
+            accepted[pair] = match_row(match.dict())
+            detail = None
+        results.append((match, pair, detail))
+
+    def insert(db: Session):
+        # One INSERT ... ON CONFLICT for the whole batch; pairs already stored come back missing
+        created = {}
+        if accepted:
+            rows = insert_ignoring_conflicts(db, Match, list(accepted.values()), Match.id, Match.team_low, Match.team_high)
+            created = {(row.team_low, row.team_high): row.id for row in rows}
+            bump_version(db)
+        db.commit()
+        return created
+    created = await run_db(db, insert)
+
+    response = []
+    for match, pair, detail in results:
+        if detail is None and pair in created:
+            response.append(MatchBulkResult(team_a=match.team_a, team_b=match.team_b, created=True, id=created[pair]))
+        else:
+            response.append(MatchBulkResult(team_a=match.team_a, team_b=match.team_b, created=False, detail=detail or "Match already exists"))
+    return response
 
 @app.get("/matches/{match_id}", response_model=MatchResponse)
-def get_match(match_id: int, db: Session = Depends(get_db)):
-    db_match = db.query(Match).filter(Match.id == match_id).first()
-    return db_match
+async def get_match(match_id: int, db: AnySession = Depends(get_db)):
+    return await run_db(db, lambda db: db.query(Match).filter(Match.id == match_id).first())
 
 @app.get("/matches/{team_a}/{team_b}", response_model=MatchResponse)
-def get_match_by_teams(team_a: str, team_b: str, db: Session = Depends(get_db)):
-    db_match = db.query(Match).filter(Match.team_a == team_a, Match.team_b == team_b).first()
-    db_match_2 = db.query(Match).filter(Match.team_a == team_b, Match.team_b == team_a).first()
-    if db_match is None and db_match_2 is None:
+async def get_match_by_teams(team_a: str, team_b: str, db: AnySession = Depends(get_db)):
+    team_low, team_high = pair_key(team_a, team_b)
+    db_match = await run_db(db, lambda db: db.query(Match).filter(Match.team_low == team_low, Match.team_high == team_high).first())
+    if db_match is None:
         raise HTTPException(status_code=404, detail="Match not found")
-    return db_match if db_match else db_match_2
+    return db_match
+
+# Rows fetched per round trip when streaming from a server-side cursor
+STREAM_BATCH_SIZE = 1000
+
+def matches_after(after_id: Optional[int]):
+    query = select(Match.id, Match.team_a, Match.team_b, Match.goals_a, Match.goals_b).order_by(Match.id)
+    if after_id is not None:
+        query = query.where(Match.id > after_id)
+    return query
+
+# The request's session is closed before streaming starts, so the streams use their own
+
+def stream_matches(after_id: Optional[int]):
+    db = SessionLocal()
+    try:
+        rows = db.execute(matches_after(after_id).execution_options(stream_results=True, yield_per=STREAM_BATCH_SIZE))
+        for row in rows:
+            yield json.dumps(row._asdict()) + "\n"
+    finally:
+        db.close()
+
+async def stream_matches_async(after_id: Optional[int]):
+    async with AsyncSessionLocal() as db:
+        rows = await db.stream(matches_after(after_id).execution_options(yield_per=STREAM_BATCH_SIZE))
+        async for row in rows:
+            yield json.dumps(row._asdict()) + "\n"
 
 @app.get("/matches", response_model=List[MatchResponse])
-def all_matches(db: Session = Depends(get_db)):
-    return db.query(Match).all()
+async def all_matches(
+    response: Response,
+    after_id: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    stream: bool = False,
+    db: AnySession = Depends(get_db)
+):
+    if stream:
+        rows = stream_matches_async(after_id) if DB_ASYNC else stream_matches(after_id)
+        return StreamingResponse(rows, media_type="application/x-ndjson")
+
+    query = matches_after(after_id)
+    if limit is not None:
+        query = query.limit(limit)
+    matches = await run_db(db, lambda db: [row._asdict() for row in db.execute(query)])
+    if limit is not None and len(matches) == limit:
+        # Cursor for the next page
+        response.headers["X-Next-After"] = str(matches[-1]["id"])
+    return matches
 
 @app.put("/matches/{match_id}", response_model=MatchCreate)
-def edit_match(match_id: int, match: MatchUpdate, db: Session = Depends(get_db)):
-    db_match = db.query(Match).filter(Match.id == match_id).first()
-    if db_match is None:
-        raise HTTPException(status_code=404, detail="Match not found")
-    db_match.team_a = match.team_a
-    db_match.team_b = match.team_b
-    db_match.goals_a = match.goals_a
-    db_match.goals_b = match.goals_b
-    db.commit()
-    db.refresh(db_match)
-    return db_match
+async def edit_match(match_id: int, match: MatchUpdate, db: AnySession = Depends(get_db)):
+    def edit(db: Session):
+        db_match = db.query(Match).filter(Match.id == match_id).first()
+        if db_match is None:
+            raise HTTPException(status_code=404, detail="Match not found")
+        db_match.team_a = match.team_a
+        db_match.team_b = match.team_b
+        db_match.team_low, db_match.team_high = pair_key(match.team_a, match.team_b)
+        db_match.goals_a = match.goals_a
+        db_match.goals_b = match.goals_b
+        try:
+            db.flush()
+            bump_version(db)
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise HTTPException(status_code=400, detail="Match already exists")
+        db.refresh(db_match)
+        return db_match
+    return await run_db(db, edit)
+
+@app.post("/matches/rename-team")
+async def rename_team(rename: TeamRename, db: AnySession = Depends(get_db)):
+    def apply(db: Session):
+        # One UPDATE: each name column is swapped where it holds the old name, and the pair key is
+        # recomputed from the swapped names, since the new name may sort differently
+        table = Match.__table__
+        team_a = case((table.c.team_a == rename.old_name, rename.new_name), else_=table.c.team_a)
+        team_b = case((table.c.team_b == rename.old_name, rename.new_name), else_=table.c.team_b)
+        team_low, team_high = pair_key_columns(team_a, team_b, db.bind.dialect.name)
+        try:
+            renamed = db.execute(
+                update(table)
+                .where(or_(table.c.team_a == rename.old_name, table.c.team_b == rename.old_name))
+                .values(team_a=team_a, team_b=team_b, team_low=team_low, team_high=team_high)
+            ).rowcount
+            if renamed:
+                bump_version(db)
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise HTTPException(status_code=400, detail=f"Renaming would duplicate a match of '{rename.new_name}'")
+        return renamed
+    return {"renamed": await run_db(db, apply)}
 
 @app.delete("/matches")
-def delete_all_matches(db: Session = Depends(get_db)):
-    db.query(Match).delete()
-    db.commit()
-    return {"message": "All matches deleted successfully"}
\ No newline at end of file
+async def delete_all_matches(db: AnySession = Depends(get_db)):
+    def delete(db: Session):
+        db.query(Match).delete()
+        bump_version(db)
+        db.commit()
+    await run_db(db, delete)
+    return {"message": "All matches deleted successfully"}
@@ -1,122 +1,228 @@
+import os
+import secrets
+import asyncio
+import httpx
 from fastapi import FastAPI, HTTPException
-from typing import List, Dict, Any
-from datetime import datetime
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Dict, Any, Optional
+from standings import Standings, calculate_rankings
+from validation import validate_team_data, validate_match_result, validate_match_data
+from ranking_pool import RankingPool
+from simulation import simulate_qualification
+from metrics import instrument_app, RANKING_TEAMS, RANKING_MATCHES, RANKING_SECONDS
+import tracing
+import wire
+from result_cache import ResultCache, payload_key
 
-app = FastAPI()
+# Bodies are negotiated: MessagePack or JSON, and compressed when the client accepts it
+app = FastAPI(default_response_class=wire.NegotiatedResponse)
+app.router.route_class = wire.WireRoute
+instrument_app(app)
+tracing.instrument_app(app)
+app.add_middleware(wire.CompressionMiddleware)
 
-# Helper function to parse date strings
-def parse_date(date_str: str) -> datetime:
-    try:
-        return datetime.strptime(date_str, "%d/%m")
-    except ValueError:
-        raise ValueError(f"Invalid date format: {date_str}")
-
-# Helper function to validate and parse input data
-def validate_team_data(data: dict) -> dict:
-    if not all(key in data for key in ("name", "date", "group")):
-        raise ValueError("Missing required team fields")
-    return {
-        "name": str(data["name"]),
-        "date":  parse_date(data["date"]),
-        "group": int(data["group"])
-    }
-
-def validate_match_data(data: dict) -> dict:
-    if not all(key in data for key in ("team_a", "team_b", "goals_a", "goals_b", "id")):
-        raise ValueError("Missing required match fields")
-    return {
-        "team_a": str(data["team_a"]),
-        "team_b": str(data["team_b"]),
-        "goals_a": int(data["goals_a"]),
-        "goals_b": int(data["goals_b"]),
-        "id": int(data["id"])
-    }
-
-def calculate_rankings(teams: List[Dict[str, Any]], matches: List[Dict[str, Any]]) -> Dict[int, List[Dict[str, Any]]]:
-    # Initialize ranking information for each team
-    rankings = {}
-    for team in teams:
-        group = team["group"]
-        if group not in rankings:
-            rankings[group] = {}
-        rankings[group][team["name"]] = {
-            'total_points': 0,
-            'total_goals': 0,
-            'alternate_points': 0,
-            'registration_date': team["date"],
-        }
-
-    # Process each match and update rankings
-    for match in matches:
-        team_a = match["team_a"]
-        team_b = match["team_b"]
-        goals_a = match["goals_a"]
-        goals_b = match["goals_b"]
-
-        # Find the group that both teams belong to (assuming they are in the same group)
-        group_a = next((team["group"] for team in teams if team["name"] == team_a), None)
-        group_b = next((team["group"] for team in teams if team["name"] == team_b), None)
-
-        if group_a != group_b or group_a is None:
-            continue  # Skip matches if teams are not in the same group or if teams don't exist
-
-        group = group_a  # Both teams are in the same group
-
-        # Update goals scored
-        rankings[group][team_a]['total_goals'] += goals_a
-        rankings[group][team_b]['total_goals'] += goals_b
-
-        # Determine match points and alternate points
-        if goals_a > goals_b:
-            rankings[group][team_a]['total_points'] += 3
-            rankings[group][team_a]['alternate_points'] += 5
-            rankings[group][team_b]['alternate_points'] += 1
-        elif goals_b > goals_a:
-            rankings[group][team_b]['total_points'] += 3
-            rankings[group][team_b]['alternate_points'] += 5
-            rankings[group][team_a]['alternate_points'] += 1
-        else:
-            rankings[group][team_a]['total_points'] += 1
-            rankings[group][team_b]['total_points'] += 1
-            rankings[group][team_a]['alternate_points'] += 3
-            rankings[group][team_b]['alternate_points'] += 3
-
-    # Group teams by their respective groups
-    grouped_rankings = {}
-    for team in teams:
-        group = team["group"]
-        if group not in grouped_rankings:
-            grouped_rankings[group] = []
-        if team["name"] in rankings[group]:
-            data = rankings[group][team["name"]]
-            grouped_rankings[group].append({'team': team["name"], **data})
-
-    # Sort teams within each group by the criteria
-    for group in grouped_rankings:
-        sorted_rankings = sorted(
-            grouped_rankings[group],
-            key=lambda item: (
-                -item['total_points'],
-                -item['total_goals'],
-                -item['alternate_points'],
-                item['registration_date']
-            )
-        )
-        grouped_rankings[group] = sorted_rankings
-
-    return grouped_rankings
+# Live group tables, kept up to date by the delta endpoints below
+standings = Standings()
+
+TEAM_SERVICE_URL = os.getenv("TEAM_SERVICE_URL")
+MATCH_SERVICE_URL = os.getenv("MATCH_SERVICE_URL")
+
+# Shared keep-alive client for pulling rankings input from the other services
+http_client: httpx.AsyncClient = None
+
+# POST /rankings payloads of at least RANKING_PARALLEL_MIN_TEAMS teams are ranked group by group
+# in RANKING_PROCESSES worker processes; smaller ones in the request's thread
+ranking_pool = RankingPool(
+    int(os.getenv("RANKING_PROCESSES", str(os.cpu_count() or 1))),
+    int(os.getenv("RANKING_PARALLEL_MIN_TEAMS", "20000"))
+)
+
+@app.on_event("startup")
+async def on_startup():
+    global http_client
+    http_client = httpx.AsyncClient(timeout=httpx.Timeout(30.0, connect=5.0))
+    ranking_pool.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await http_client.aclose()
+    ranking_pool.shutdown()
+
+def timed(operation: str, fn, *args):
+    """Calls fn(*args), recording how long it took as a ranking_compute_seconds sample and a span."""
+    with tracing.span(operation), RANKING_SECONDS.labels(operation).time():
+        return fn(*args)
+
+def record_input(operation: str, teams: list, matches: list):
+    RANKING_TEAMS.labels(operation).observe(len(teams))
+    RANKING_MATCHES.labels(operation).observe(len(matches))
+
+# POST /rankings results by payload hash; the endpoint is a pure function of its payload
+ranking_cache = ResultCache(
+    int(os.getenv("RANKING_CACHE_SIZE", "32")),
+    float(os.getenv("RANKING_CACHE_TTL", "300"))
+)
+
+def compute_rankings(payload: Dict[str, Any], limit: Optional[int]) -> Dict[int, List[Dict[str, Any]]]:
+    if ranking_pool.applies(payload["teams"]):
+        # Workers validate their share of the groups as well, which costs more than ranking them
+        record_input("calculate", payload["teams"], payload["matches"])
+        return timed("calculate", ranking_pool.rank, payload["teams"], payload["matches"], limit)
+
+    # Validate and parse input data
+    teams = [validate_team_data(team) for team in payload["teams"]]
+    matches = [validate_match_data(match) for match in payload["matches"]]
+
+    # Calculate rankings
+    record_input("calculate", teams, matches)
+    return timed("calculate", calculate_rankings, teams, matches, limit)
+
+def check_limit(limit: Optional[int]):
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
 
 @app.post("/rankings")
-def get_rankings(payload: Dict[str, Any]):
+def get_rankings(payload: Dict[str, Any], limit: Optional[int] = None):
+    # With a limit, only each group's top `limit` teams are selected and returned
+    check_limit(limit)
     try:
-        # Validate and parse input data
-        teams = [validate_team_data(team) for team in payload["teams"]]
-        matches = [validate_match_data(match) for match in payload["matches"]]
-        
-        # Calculate rankings
-        results = calculate_rankings(teams, matches)
-        return results
+        # Repeated payloads are served from the cache, and concurrent ones computed once
+        key = f"{payload_key(payload['teams'], payload['matches'])}:{limit}"
+        return ranking_cache.get_or_compute(key, compute_rankings, payload, limit)
     except Exception as e:
         # Log the exception for debugging purposes
         print(f"Error calculating rankings: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
+
+async def fetch_rankings_input():
+    """Fetches all teams and matches from their services concurrently."""
+    if not TEAM_SERVICE_URL or not MATCH_SERVICE_URL:
+        raise RuntimeError("TEAM_SERVICE_URL and MATCH_SERVICE_URL must be set to fetch rankings input")
+    async def call(service: str, base_url: str, path: str):
+        with tracing.span(f"call {service}", path=path):
+            return await http_client.get(f"{base_url}{path}", headers={**tracing.outgoing_headers(), "Accept": wire.MSGPACK})
+
+    teams_response, matches_response = await asyncio.gather(
+        call("team_service", TEAM_SERVICE_URL, "/teams"),
+        call("match_service", MATCH_SERVICE_URL, "/matches")
+    )
+    teams_response.raise_for_status()
+    matches_response.raise_for_status()
+    return wire.decode_response(teams_response), wire.decode_response(matches_response)
+
+@app.get("/rankings")
+async def current_rankings(source: str = "state", limit: Optional[int] = None):
+    check_limit(limit)
+    if source == "state":
+        return await run_in_threadpool(timed, "standings", standings.rankings, limit)
+    if source != "services":
+        raise HTTPException(status_code=400, detail="source must be 'state' or 'services'")
+
+    # Rebuild the live standings from the team and match services
+    try:
+        teams, matches = await fetch_rankings_input()
+    except (httpx.HTTPError, RuntimeError) as e:
+        print(f"Error fetching rankings input: {e}")
+        raise HTTPException(status_code=502, detail="Failed to fetch teams and matches")
+    try:
+        teams = [validate_team_data(team) for team in teams]
+        matches = [validate_match_data(match) for match in matches]
+        record_input("load", teams, matches)
+        await run_in_threadpool(timed, "load", standings.load, teams, matches)
+        return await run_in_threadpool(timed, "standings", standings.rankings, limit)
+    except Exception as e:
+        print(f"Error calculating rankings: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+@app.get("/rankings/team/{name}")
+def team_rank(name: str):
+    # The team's rank in its group of the live standings, without sorting the group
+    try:
+        return timed("team_rank", standings.team_rank, name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Team not found")
+
+# Qualification simulations stop early once this much time is spent, unless a request sets its own budget
+SIMULATION_BUDGET_MS = float(os.getenv("RANKING_SIMULATION_BUDGET_MS", "2000"))
+MAX_SIMULATIONS = 1_000_000
+
+@app.post("/rankings/qualification")
+def qualification_probabilities(
+    payload: Dict[str, Any],
+    simulations: int = 10000,
+    seed: Optional[int] = None,
+    qualifiers: int = 4,
+    budget_ms: Optional[float] = None
+):
+    # Each team's chance of a top `qualifiers` finish once the remaining fixtures are played,
+    # from simulating them; the same seed and simulation count give the same probabilities
+    if not 1 <= simulations <= MAX_SIMULATIONS:
+        raise HTTPException(status_code=400, detail=f"simulations must be between 1 and {MAX_SIMULATIONS}")
+    if qualifiers < 1:
+        raise HTTPException(status_code=400, detail="qualifiers must be at least 1")
+    if seed is not None and seed < 0:
+        raise HTTPException(status_code=400, detail="seed must not be negative")
+    try:
+        teams = [validate_team_data(team) for team in payload["teams"]]
+        matches = [validate_match_result(match) for match in payload.get("matches", [])]
+        fixtures = payload.get("fixtures")
+        if fixtures is not None:
+            fixtures = [(str(fixture["team_a"]), str(fixture["team_b"])) for fixture in fixtures]
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid rankings input: {e}")
+
+    if seed is None:
+        seed = secrets.randbits(63)
+    budget = (budget_ms if budget_ms is not None else SIMULATION_BUDGET_MS) / 1000
+    record_input("simulate", teams, matches)
+    return timed("simulate", simulate_qualification, teams, matches, fixtures, simulations, seed, qualifiers, budget)
+
+@app.post("/rankings/teams")
+def add_teams(payload: Dict[str, Any]):
+    try:
+        teams = [validate_team_data(team) for team in payload["teams"]]
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid team data: {e}")
+    timed("add_teams", standings.add_teams, teams)
+    return {"status": "success"}
+
+@app.put("/rankings/teams/{old_name}")
+def edit_team(old_name: str, payload: Dict[str, Any]):
+    try:
+        team = validate_team_data(payload)
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid team data: {e}")
+    try:
+        timed("edit_team", standings.edit_team, old_name, team)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Team not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "success"}
+
+@app.post("/rankings/matches")
+def add_matches(payload: Dict[str, Any]):
+    try:
+        matches = [validate_match_result(match) for match in payload["matches"]]
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid match data: {e}")
+    timed("add_matches", standings.add_matches, matches)
+    return {"status": "success"}
+
+@app.put("/rankings/matches")
+def edit_match(payload: Dict[str, Any]):
+    try:
+        old = validate_match_result(payload["old"])
+        new = validate_match_result(payload["new"])
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid match data: {e}")
+    try:
+        timed("edit_match", standings.edit_match, old, new)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Match not found")
+    return {"status": "success"}
+
+@app.delete("/rankings")
+def reset_rankings():
+    standings.reset()
+    return {"message": "Rankings reset successfully"}
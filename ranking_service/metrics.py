@@ -0,0 +1,73 @@
+"""Prometheus metrics for the service, served at GET /metrics.
+
+With several uvicorn workers, PROMETHEUS_MULTIPROC_DIR makes every scrape
+add up the samples of all workers; without it, a scrape only shows the
+worker that answered it.
+"""
+import os
+import time
+
+# The multiprocess directory must exist before prometheus_client is imported
+if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+from fastapi import FastAPI, Request, Response
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+from starlette.routing import Match
+
+# The service's own registry, so nothing else in the process shows up in /metrics
+registry = CollectorRegistry()
+
+REQUESTS = Counter("http_requests_total", "HTTP requests handled", ["method", "route", "status"], registry=registry)
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "Time to handle an HTTP request, up to its response headers", ["method", "route"], registry=registry)
+IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being handled", ["method", "route"], registry=registry, multiprocess_mode="livesum")
+
+# Sizes run from a group to a whole tournament
+SIZE_BUCKETS = (10, 100, 1000, 10000, 100000, 1000000)
+RANKING_TEAMS = Histogram("ranking_input_teams", "Teams in a rankings computation", ["operation"], buckets=SIZE_BUCKETS, registry=registry)
+RANKING_MATCHES = Histogram("ranking_input_matches", "Matches in a rankings computation", ["operation"], buckets=SIZE_BUCKETS, registry=registry)
+RANKING_SECONDS = Histogram("ranking_compute_seconds", "Time to compute rankings or apply a change to the standings", ["operation"], registry=registry)
+RANKING_CACHE_REQUESTS = Counter("ranking_cache_requests_total", "POST /rankings requests by how the result cache served them (hit, miss or coalesced)", ["result"], registry=registry)
+
+def route_of(app: FastAPI, scope) -> str:
+    """The path template of the route a request goes to, so /teams/{name} is one series, not one per team."""
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+def metrics_response() -> Response:
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        scraped = CollectorRegistry()
+        multiprocess.MultiProcessCollector(scraped)
+    else:
+        scraped = registry
+    return Response(generate_latest(scraped), media_type=CONTENT_TYPE_LATEST)
+
+def instrument_app(app: FastAPI):
+    """Serves /metrics and records every request. Call it after the app's own middleware, such as
+    the ETag check, so it sees responses they short-circuit, and before tracing.instrument_app.
+    Requests then pass through compression, tracing, metrics and the ETag check, in that order."""
+    @app.middleware("http")
+    async def record_request(request: Request, call_next):
+        if request.url.path == "/metrics":
+            return metrics_response()
+        method, route = request.method, route_of(app, request.scope)
+        in_flight = IN_FLIGHT.labels(method, route)
+        in_flight.inc()
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            in_flight.dec()
+            REQUEST_SECONDS.labels(method, route).observe(time.perf_counter() - started)
+            REQUESTS.labels(method, route, str(status)).inc()
+
+def mark_worker_stopped():
+    # Drops this process's live gauges from the multiprocess totals
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,108 @@
+import heapq
+import multiprocessing
+import os
+import site
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional
+
+from standings import calculate_rankings
+from validation import validate_team_data, validate_match_data
+
+# Fields of a ranking row, in the order workers send them back
+ROW_FIELDS = ('team', 'total_points', 'total_goals', 'alternate_points', 'registration_date')
+
+def rank_part(teams: List[Dict[str, Any]], matches: List[Dict[str, Any]], limit: Optional[int]) -> Dict[int, List[tuple]]:
+    """Validates and ranks one set of groups in a worker. Rows come back as tuples, which pickle faster than dicts."""
+    rankings = calculate_rankings(
+        [validate_team_data(team) for team in teams],
+        [validate_match_data(match) for match in matches],
+        limit
+    )
+    return {group: [tuple(row[field] for field in ROW_FIELDS) for row in rows] for group, rows in rankings.items()}
+
+def partition_by_group(teams: List[Dict[str, Any]], matches: List[Dict[str, Any]], parts: int):
+    """Splits unvalidated teams and matches into up to `parts` sets of whole groups.
+
+    Returns the groups in the order calculate_rankings lists them and the
+    (teams, matches) of each set. Every team and match goes to some set, so
+    each is still validated: repeated registrations go with the first one,
+    and matches with their first team's group, where calculate_rankings
+    skips them if they are not between two teams of one group.
+    """
+    group_of = {}
+    members = {}
+    for team in teams:
+        name = str(team["name"])
+        group = group_of.get(name)
+        if group is None:
+            group = group_of[name] = int(team["group"])
+        members.setdefault(group, []).append(team)
+
+    first_group = next(iter(members), None)
+    fixtures = {group: [] for group in members}
+    for match in matches:
+        fixtures[group_of.get(str(match["team_a"]), first_group)].append(match)
+
+    # Largest groups first, each to the set with the least work so far
+    loads = [(0, part) for part in range(parts)]
+    sets = [([], []) for _ in range(parts)]
+    for group in sorted(members, key=lambda group: -(len(members[group]) + len(fixtures[group]))):
+        load, part = heapq.heappop(loads)
+        sets[part][0].extend(members[group])
+        sets[part][1].extend(fixtures[group])
+        heapq.heappush(loads, (load + len(members[group]) + len(fixtures[group]), part))
+
+    return list(members), [part for part in sets if part[0]]
+
+class RankingPool:
+    """Worker processes validating and ranking the groups of large payloads in parallel.
+
+    Groups are ranked independently of each other, so a payload of at least
+    `min_teams` teams is split into one set of whole groups per process and
+    the sets' rankings are merged. Smaller payloads are not worth shipping to
+    other processes. With fewer than two processes there is no pool.
+    """
+
+    def __init__(self, processes: int, min_teams: int):
+        self.processes = processes
+        self.min_teams = min_teams
+        self._executor = None
+
+    def start(self):
+        if self.processes > 1:
+            # Spawned rather than forked, as the server already runs threads. Workers
+            # import rank_part themselves, so they need this directory on their path
+            self._executor = ProcessPoolExecutor(
+                self.processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=site.addsitedir,
+                initargs=(os.path.dirname(os.path.abspath(__file__)),)
+            )
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def applies(self, teams: List[Dict[str, Any]]) -> bool:
+        return self._executor is not None and len(teams) >= self.min_teams
+
+    def rank(self, teams: List[Dict[str, Any]], matches: List[Dict[str, Any]], limit: Optional[int] = None) -> Dict[int, List[Dict[str, Any]]]:
+        """Validates and ranks unvalidated teams and matches, as calculate_rankings would rank them validated."""
+        try:
+            groups, parts = partition_by_group(teams, matches, self.processes)
+        except (KeyError, TypeError, ValueError):
+            groups, parts = None, []
+        if len(parts) < 2:
+            # One group, or malformed input, which validating here rejects as usual
+            return calculate_rankings(
+                [validate_team_data(team) for team in teams],
+                [validate_match_data(match) for match in matches],
+                limit
+            )
+
+        ranked = {}
+        part_teams, part_matches = zip(*parts)
+        for result in self._executor.map(rank_part, part_teams, part_matches, [limit] * len(parts)):
+            ranked.update(result)
+        return {group: [dict(zip(ROW_FIELDS, row)) for row in ranked[group]] for group in groups}
@@ -0,0 +1,76 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable
+
+from metrics import RANKING_CACHE_REQUESTS
+
+def payload_key(teams: Any, matches: Any) -> str:
+    """sha256 of the teams and matches as canonical JSON, so equal payloads share a key
+    whatever their key order or whitespace. List order is kept: it decides ties."""
+    canonical = json.dumps([teams, matches], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+class ResultCache:
+    """LRU of computed results, each kept for at most `ttl` seconds.
+
+    A key that is missing is computed once: requests arriving for it while
+    the first one computes wait for that result (or its exception) instead
+    of computing it again. Errors are not cached.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expiry, result)
+        self._pending = {}             # key -> Future of the computation in progress
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: str, compute: Callable, *args):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                RANKING_CACHE_REQUESTS.labels("hit").inc()
+                return entry[1]
+            future = self._pending.get(key)
+            leader = future is None
+            if leader:
+                future = self._pending[key] = Future()
+
+        if not leader:
+            RANKING_CACHE_REQUESTS.labels("coalesced").inc()
+            return future.result()
+
+        RANKING_CACHE_REQUESTS.labels("miss").inc()
+        try:
+            result = compute(*args)
+        except Exception as e:
+            with self._lock:
+                del self._pending[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._pending[key]
+            self._store(key, result)
+        future.set_result(result)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _store(self, key: str, result):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, result)
+        self._entries.move_to_end(key)
+        # Drop expired entries first, then the least recently used
+        now = time.monotonic()
+        for stale in [stale for stale, (expiry, _) in self._entries.items() if expiry <= now]:
+            del self._entries[stale]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -0,0 +1,187 @@
+"""Monte Carlo estimates of each team's chance to finish in its group's top places.
+
+The remaining fixtures of every group are played out in many simulations at
+once, as NumPy arrays of shape (simulations, fixture sides). Goals are drawn from
+independent Poisson distributions: a side's rate is its goals scored so far
+times its opponent's goals conceded, over the tournament average, each
+blended with PRIOR_MATCHES matches at that average. Each simulated table is
+then ordered by the ranking key (points, goals, alternate points, then
+earliest registration) with one sort of each group's row of keys.
+"""
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from standings import (
+    WIN_POINTS,
+    DRAW_POINTS,
+    WIN_ALTERNATE_POINTS,
+    LOSS_ALTERNATE_POINTS,
+    DRAW_ALTERNATE_POINTS
+)
+
+# Goals per team and match assumed while no goals have been scored
+DEFAULT_GOAL_RATE = 1.3
+# Matches at the average rate that each team's own record is blended with
+PRIOR_MATCHES = 2
+# Array cells per simulated chunk; simulations run a chunk at a time to bound memory
+CHUNK_CELLS = 2_000_000
+
+# Points and alternate points of a side, indexed by the sign of its goal difference plus one
+RESULT_POINTS = np.array([0, DRAW_POINTS, WIN_POINTS])
+RESULT_ALTERNATE = np.array([LOSS_ALTERNATE_POINTS, DRAW_ALTERNATE_POINTS, WIN_ALTERNATE_POINTS])
+
+def remaining_fixtures(groups: List[int], played: set) -> List[Tuple[int, int]]:
+    """Every pair of teams in a group that has not played yet: groups play a round robin."""
+    members = {}
+    for slot, group in enumerate(groups):
+        members.setdefault(group, []).append(slot)
+    return [
+        (slot_a, slot_b)
+        for slots in members.values()
+        for position, slot_a in enumerate(slots)
+        for slot_b in slots[position + 1:]
+        if (slot_a, slot_b) not in played
+    ]
+
+def simulate_qualification(
+    teams: List[Dict[str, Any]],
+    matches: List[Dict[str, Any]],
+    fixtures: Optional[List[Tuple[str, str]]],
+    simulations: int,
+    seed: int,
+    qualifiers: int,
+    budget: float
+) -> Dict[str, Any]:
+    """Plays out the remaining fixtures up to `simulations` times, or until `budget` seconds are spent.
+
+    Teams and matches are validated; as in calculate_rankings, a repeated
+    name keeps its first registration and matches not between two teams of
+    one group do not count. Without `fixtures`, each group's unplayed pairs
+    are its remaining fixtures.
+    """
+    index, names, groups, dates = {}, [], [], []
+    for team in teams:
+        if team["name"] in index:
+            continue
+        index[team["name"]] = len(names)
+        names.append(team["name"])
+        groups.append(team["group"])
+        dates.append(team["date"].toordinal())
+    count = len(names)
+
+    def same_group(name_a: str, name_b: str) -> bool:
+        return name_a in index and name_b in index and groups[index[name_a]] == groups[index[name_b]]
+
+    played = [
+        (index[match["team_a"]], index[match["team_b"]], match["goals_a"], match["goals_b"])
+        for match in matches if same_group(match["team_a"], match["team_b"])
+    ]
+    played_a, played_b, played_goals_a, played_goals_b = np.array(played, dtype=np.int64).reshape(-1, 4).T
+    if fixtures is None:
+        pairs = set(zip(played_a.tolist(), played_b.tolist()))
+        pairs |= {(slot_b, slot_a) for slot_a, slot_b in pairs}
+        fixtures = remaining_fixtures(groups, pairs)
+    else:
+        fixtures = [(index[team_a], index[team_b]) for team_a, team_b in fixtures if team_a != team_b and same_group(team_a, team_b)]
+    fixture_a, fixture_b = np.array(fixtures, dtype=np.int64).reshape(-1, 2).T
+
+    # Standings so far, from each match's two sides
+    played_sides = np.concatenate((played_a, played_b))
+    played_scored = np.concatenate((played_goals_a, played_goals_b))
+    played_conceded = np.concatenate((played_goals_b, played_goals_a))
+    played_results = np.sign(played_scored - played_conceded) + 1
+
+    def per_team(values) -> np.ndarray:
+        return np.bincount(played_sides, values, count).astype(np.int64)
+
+    points = per_team(RESULT_POINTS[played_results])
+    goals = per_team(played_scored)
+    alternate = per_team(RESULT_ALTERNATE[played_results])
+    conceded = per_team(played_conceded)
+    games = np.bincount(played_sides, minlength=count)
+
+    # Remaining fixtures as sides too, sorted by team so each team's sides are
+    # adjacent, with `opponents` pointing at the other side of the same fixture
+    sides = np.concatenate((fixture_a, fixture_b))
+    side_order = np.argsort(sides, kind="stable")
+    position = np.empty_like(side_order)
+    position[side_order] = np.arange(len(sides))
+    opponents = position[(side_order + len(fixture_a)) % max(len(sides), 1)]
+    side_teams = sides[side_order]
+    playing, first_sides = np.unique(side_teams, return_index=True)
+
+    # Each side scores at its own scoring rate times its opponent's conceding rate, over the average
+    average = goals.sum() / games.sum() if games.sum() else 0.0
+    average = average or DEFAULT_GOAL_RATE
+    attack = (goals + PRIOR_MATCHES * average) / (games + PRIOR_MATCHES)
+    defence = (conceded + PRIOR_MATCHES * average) / (games + PRIOR_MATCHES)
+    side_rates = attack[side_teams] * defence[side_teams[opponents]] / average
+
+    # Each group's members in a row of `members`, padded with the extra slot `count`,
+    # ordered by earliest registration and then registration order: a stable sort of a
+    # row then breaks ties as calculate_rankings does
+    group_index = {group: number for number, group in enumerate(dict.fromkeys(groups))}
+    group_of = np.array([group_index[group] for group in groups], dtype=np.int64)
+    sizes = np.bincount(group_of, minlength=len(group_index))
+    by_group = np.lexsort((np.arange(count), dates, group_of))
+    members = np.full((len(sizes), sizes.max(initial=0)), count, dtype=np.int64)
+    members[group_of[by_group], np.arange(count) - (np.cumsum(sizes) - sizes)[group_of[by_group]]] = by_group
+    rows = np.arange(len(sizes))[:, None]
+
+    def group_order(points, goals, alternate) -> np.ndarray:
+        """Each group's slots from first to last, for every simulation: shape (simulations, groups, width)."""
+        # One key orders by points, then goals, then alternate points, all descending
+        goals_base = int(goals.max(initial=0)) + 1
+        alternate_base = int(alternate.max(initial=0)) + 1
+        keys = -((points * goals_base + goals) * alternate_base + alternate)
+        keys = np.concatenate((keys, np.full(keys.shape[:-1] + (1,), np.iinfo(np.int64).max)), axis=-1)
+        return members[rows, np.argsort(keys[..., members], axis=-1, kind="stable")]
+
+    def totals(base, values) -> np.ndarray:
+        # Adds each simulation's side values, a row per simulation, to the standings so far
+        result = np.repeat(base[None, :], len(values), axis=0)
+        if len(playing):
+            result[:, playing] += np.add.reduceat(values, first_sides, axis=1)
+        return result
+
+    rng = np.random.default_rng(seed)
+    chunk = max(1, CHUNK_CELLS // max(members.size, len(sides), 1))
+    qualified = np.zeros(count + 1, dtype=np.int64)
+    done = 0
+    deadline = time.monotonic() + budget
+    while done < simulations:
+        size = min(chunk, simulations - done)
+        scored = rng.poisson(side_rates, (size, len(side_rates)))
+        results = np.sign(scored - scored[:, opponents]) + 1
+        tables = group_order(
+            totals(points, RESULT_POINTS[results]),
+            totals(goals, scored),
+            totals(alternate, RESULT_ALTERNATE[results])
+        )
+        qualified += np.bincount(tables[..., :qualifiers].ravel(), minlength=count + 1)
+        done += size
+        if time.monotonic() >= deadline:
+            break
+
+    # Teams listed per group in their current order
+    remaining = np.bincount(sides, minlength=count)
+    probabilities = {group: [] for group in group_index}
+    for slot in group_order(points, goals, alternate).ravel().tolist():
+        if slot == count:
+            continue
+        probabilities[groups[slot]].append({
+            'team': names[slot],
+            'total_points': int(points[slot]),
+            'total_goals': int(goals[slot]),
+            'alternate_points': int(alternate[slot]),
+            'remaining_matches': int(remaining[slot]),
+            'qualification_probability': float(qualified[slot] / done),
+        })
+    return {
+        'simulations': done,
+        'complete': done == simulations,
+        'seed': seed,
+        'groups': [{'group': group, 'teams': rows} for group, rows in probabilities.items()],
+    }
@@ -0,0 +1,314 @@
+import heapq
+import threading
+from typing import List, Dict, Any, Optional
+
+# Points awarded to (winner, loser) and to each side of a draw
+WIN_POINTS, DRAW_POINTS = 3, 1
+WIN_ALTERNATE_POINTS, LOSS_ALTERNATE_POINTS, DRAW_ALTERNATE_POINTS = 5, 1, 3
+
+
+def match_points(goals_a: int, goals_b: int):
+    """Returns ((points_a, alternate_a), (points_b, alternate_b)) for a match result."""
+    if goals_a > goals_b:
+        return (WIN_POINTS, WIN_ALTERNATE_POINTS), (0, LOSS_ALTERNATE_POINTS)
+    if goals_b > goals_a:
+        return (0, LOSS_ALTERNATE_POINTS), (WIN_POINTS, WIN_ALTERNATE_POINTS)
+    return (DRAW_POINTS, DRAW_ALTERNATE_POINTS), (DRAW_POINTS, DRAW_ALTERNATE_POINTS)
+
+
+def calculate_rankings(teams: List[Dict[str, Any]], matches: List[Dict[str, Any]], limit: Optional[int] = None) -> Dict[int, List[Dict[str, Any]]]:
+    # Index every team once: name -> (group, slot in that group's arrays)
+    index = {}
+    names = {}
+    dates = {}
+    for team in teams:
+        if team["name"] in index:
+            continue  # Team names are unique; keep the first registration
+        group = team["group"]
+        if group not in names:
+            names[group] = []
+            dates[group] = []
+        index[team["name"]] = (group, len(names[group]))
+        names[group].append(team["name"])
+        dates[group].append(team["date"])
+
+    # Standings are held in per-group arrays indexed by slot
+    points = {group: [0] * len(members) for group, members in names.items()}
+    goals = {group: [0] * len(members) for group, members in names.items()}
+    alternate = {group: [0] * len(members) for group, members in names.items()}
+
+    # Process each match and update rankings in a single pass
+    for match in matches:
+        entry_a = index.get(match["team_a"])
+        entry_b = index.get(match["team_b"])
+        if entry_a is None or entry_b is None or entry_a[0] != entry_b[0]:
+            continue  # Skip matches if teams are not in the same group or if teams don't exist
+
+        group, slot_a = entry_a
+        slot_b = entry_b[1]
+        goals_a = match["goals_a"]
+        goals_b = match["goals_b"]
+
+        goals[group][slot_a] += goals_a
+        goals[group][slot_b] += goals_b
+
+        if goals_a > goals_b:
+            points[group][slot_a] += WIN_POINTS
+            alternate[group][slot_a] += WIN_ALTERNATE_POINTS
+            alternate[group][slot_b] += LOSS_ALTERNATE_POINTS
+        elif goals_b > goals_a:
+            points[group][slot_b] += WIN_POINTS
+            alternate[group][slot_b] += WIN_ALTERNATE_POINTS
+            alternate[group][slot_a] += LOSS_ALTERNATE_POINTS
+        else:
+            points[group][slot_a] += DRAW_POINTS
+            points[group][slot_b] += DRAW_POINTS
+            alternate[group][slot_a] += DRAW_ALTERNATE_POINTS
+            alternate[group][slot_b] += DRAW_ALTERNATE_POINTS
+
+    # Sort slots within each group by the criteria, then build the response rows.
+    # With a limit only that many are selected, through a heap instead of a full sort
+    grouped_rankings = {}
+    for group, members in names.items():
+        group_points, group_goals, group_alternate, group_dates = points[group], goals[group], alternate[group], dates[group]
+        key = lambda slot: (
+            -group_points[slot],
+            -group_goals[slot],
+            -group_alternate[slot],
+            group_dates[slot]
+        )
+        if limit is None:
+            order = sorted(range(len(members)), key=key)
+        else:
+            order = heapq.nsmallest(limit, range(len(members)), key=key)
+        grouped_rankings[group] = [
+            {
+                'team': members[slot],
+                'total_points': group_points[slot],
+                'total_goals': group_goals[slot],
+                'alternate_points': group_alternate[slot],
+                'registration_date': group_dates[slot],
+            }
+            for slot in order
+        ]
+
+    return grouped_rankings
+
+
+class Standings:
+    """In-memory group tables that are adjusted by deltas instead of being recomputed.
+
+    Every match is kept in the fixture list of both of its teams, so a team
+    edit only touches that team's matches. Only groups changed since the last
+    read are re-sorted, and the sorted rows are cached between reads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._reset()
+
+    def load(self, teams: List[Dict[str, Any]], matches: List[Dict[str, Any]]):
+        """Replaces the whole state with the given teams and matches."""
+        with self._lock:
+            self._reset()
+            for team in teams:
+                self._add_team(team)
+            for match in matches:
+                self._add_match(match)
+
+    def add_teams(self, teams: List[Dict[str, Any]]):
+        with self._lock:
+            for team in teams:
+                self._add_team(team)
+
+    def edit_team(self, old_name: str, team: Dict[str, Any]):
+        with self._lock:
+            if old_name not in self._teams:
+                raise KeyError(old_name)
+            if team["name"] != old_name and team["name"] in self._teams:
+                raise ValueError(f"Team '{team['name']}' already exists")
+            self._edit_team(old_name, team)
+
+    def add_matches(self, matches: List[Dict[str, Any]]):
+        with self._lock:
+            for match in matches:
+                self._add_match(match)
+
+    def edit_match(self, old: Dict[str, Any], new: Dict[str, Any]):
+        with self._lock:
+            record = next(
+                (
+                    record for record in self._fixtures.get(old["team_a"], [])
+                    if (record['team_a'], record['team_b'], record['goals_a'], record['goals_b'])
+                    == (old["team_a"], old["team_b"], old["goals_a"], old["goals_b"])
+                ),
+                None
+            )
+            if record is None:
+                raise KeyError(f"{old['team_a']} vs {old['team_b']}")
+            if record['applied']:
+                self._apply(record, -1)
+            self._unlink(record['team_a'], record)
+            self._unlink(record['team_b'], record)
+            self._add_match(new)
+
+    def rankings(self, limit: Optional[int] = None) -> Dict[int, List[Dict[str, Any]]]:
+        """Every group's table, or only its first `limit` rows."""
+        with self._lock:
+            if limit is None:
+                for group in self._dirty:
+                    self._sort_group(group)
+                self._dirty.clear()
+                return {group: self._tables[group] for group in self._groups}
+
+            # Cached tables are cut short; changed groups only have their top rows selected
+            return {
+                group: self._tables[group][:limit] if group not in self._dirty
+                else [self._row(name) for name in heapq.nsmallest(limit, self._groups[group], key=self._key)]
+                for group in self._groups
+            }
+
+    def team_rank(self, name: str) -> Dict[str, Any]:
+        """One team's row with its group and rank, found by counting the group's teams ranked above it."""
+        with self._lock:
+            entry = self._teams.get(name)
+            if entry is None:
+                raise KeyError(name)
+            key = self._key(name)
+            above = sum(1 for member in self._groups[entry['group']] if self._key(member) < key)
+            return {**self._row(name), 'group': entry['group'], 'rank': above + 1}
+
+    def _reset(self):
+        self._teams = {}     # name -> standing counters and registration data
+        self._fixtures = {}  # name -> match records involving that name
+        self._groups = {}    # group -> member names, in registration order
+        self._tables = {}    # group -> cached sorted rows
+        self._dirty = set()
+        self._sequence = 0
+
+    def _add_team(self, team: Dict[str, Any]):
+        if team["name"] in self._teams:
+            self._edit_team(team["name"], team)
+            return
+        self._teams[team["name"]] = {
+            'group': team["group"],
+            'date': team["date"],
+            'sequence': self._next_sequence(),
+            'total_points': 0,
+            'total_goals': 0,
+            'alternate_points': 0,
+        }
+        self._groups.setdefault(team["group"], []).append(team["name"])
+        self._dirty.add(team["group"])
+        self._attach(team["name"])
+
+    def _next_sequence(self) -> int:
+        self._sequence += 1
+        return self._sequence
+
+    def _edit_team(self, old_name: str, team: Dict[str, Any]):
+        self._detach(old_name)
+        entry = self._teams.pop(old_name)
+        members = self._groups[entry['group']]
+        members.remove(old_name)
+        self._dirty.add(entry['group'])
+        if not members:
+            del self._groups[entry['group']]
+            self._tables.pop(entry['group'], None)
+
+        # Matches keep pointing at the team through its new name
+        records = self._fixtures.pop(old_name, [])
+        for record in records:
+            if record['team_a'] == old_name:
+                record['team_a'] = team["name"]
+            if record['team_b'] == old_name:
+                record['team_b'] = team["name"]
+        self._fixtures.setdefault(team["name"], []).extend(records)
+
+        entry['group'] = team["group"]
+        entry['date'] = team["date"]
+        self._teams[team["name"]] = entry
+        self._groups.setdefault(team["group"], []).append(team["name"])
+        self._dirty.add(team["group"])
+        self._attach(team["name"])
+
+    def _add_match(self, match: Dict[str, Any]):
+        record = {
+            'team_a': match["team_a"],
+            'team_b': match["team_b"],
+            'goals_a': match["goals_a"],
+            'goals_b': match["goals_b"],
+            'applied': False,
+        }
+        self._fixtures.setdefault(record['team_a'], []).append(record)
+        self._fixtures.setdefault(record['team_b'], []).append(record)
+        if self._counts(record):
+            self._apply(record, 1)
+
+    def _unlink(self, name: str, record: Dict[str, Any]):
+        # Records are compared by identity; two results can be equal
+        records = self._fixtures[name]
+        for position, candidate in enumerate(records):
+            if candidate is record:
+                del records[position]
+                return
+
+    def _counts(self, record: Dict[str, Any]) -> bool:
+        # Matches only count once both teams exist and are in the same group
+        team_a = self._teams.get(record['team_a'])
+        team_b = self._teams.get(record['team_b'])
+        return team_a is not None and team_b is not None and team_a['group'] == team_b['group']
+
+    def _apply(self, record: Dict[str, Any], sign: int):
+        team_a = self._teams[record['team_a']]
+        team_b = self._teams[record['team_b']]
+        (points_a, alternate_a), (points_b, alternate_b) = match_points(record['goals_a'], record['goals_b'])
+        team_a['total_goals'] += sign * record['goals_a']
+        team_b['total_goals'] += sign * record['goals_b']
+        team_a['total_points'] += sign * points_a
+        team_b['total_points'] += sign * points_b
+        team_a['alternate_points'] += sign * alternate_a
+        team_b['alternate_points'] += sign * alternate_b
+        record['applied'] = sign > 0
+        self._dirty.add(team_a['group'])
+
+    def _detach(self, name: str):
+        for record in self._fixtures.get(name, []):
+            if record['applied']:
+                self._apply(record, -1)
+
+    def _attach(self, name: str):
+        for record in self._fixtures.get(name, []):
+            if not record['applied'] and self._counts(record):
+                self._apply(record, 1)
+
+    def _key(self, name: str) -> tuple:
+        # Ranking order: points, goals, alternate points, then earliest registration
+        team = self._teams[name]
+        return (
+            -team['total_points'],
+            -team['total_goals'],
+            -team['alternate_points'],
+            team['date'],
+            team['sequence']
+        )
+
+    def _row(self, name: str) -> Dict[str, Any]:
+        team = self._teams[name]
+        return {
+            'team': name,
+            'total_points': team['total_points'],
+            'total_goals': team['total_goals'],
+            'alternate_points': team['alternate_points'],
+            'registration_date': team['date'],
+        }
+
+    def _sort_group(self, group: int):
+        members = self._groups.get(group)
+        if not members:
+            return
+        self._tables[group] = [self._row(name) for name in sorted(members, key=self._key)]
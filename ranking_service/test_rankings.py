@@ -0,0 +1,188 @@
+"""Regression tests for the ranking engine, run with `python -m pytest ranking_service`.
+
+calculate_rankings is compared with the original O(matches x teams)
+implementation, kept below as an oracle, on seeded random tournaments that
+include unknown teams, matches across groups and repeated registrations.
+The group partitioning of the worker pool, the top-K selection and the live
+standings are then checked against calculate_rankings.
+"""
+import random
+
+import pytest
+
+from ranking_pool import ROW_FIELDS, RankingPool, partition_by_group, rank_part
+from standings import Standings, calculate_rankings
+from validation import validate_match_data, validate_team_data
+
+SEEDS = range(200)
+
+
+def previous_calculate_rankings(teams, matches):
+    """calculate_rankings as it was before the single-pass engine."""
+    # Initialize ranking information for each team
+    rankings = {}
+    for team in teams:
+        group = team["group"]
+        if group not in rankings:
+            rankings[group] = {}
+        rankings[group][team["name"]] = {
+            'total_points': 0,
+            'total_goals': 0,
+            'alternate_points': 0,
+            'registration_date': team["date"],
+        }
+
+    # Process each match and update rankings
+    for match in matches:
+        team_a = match["team_a"]
+        team_b = match["team_b"]
+        goals_a = match["goals_a"]
+        goals_b = match["goals_b"]
+
+        # Find the group that both teams belong to (assuming they are in the same group)
+        group_a = next((team["group"] for team in teams if team["name"] == team_a), None)
+        group_b = next((team["group"] for team in teams if team["name"] == team_b), None)
+
+        if group_a != group_b or group_a is None:
+            continue  # Skip matches if teams are not in the same group or if teams don't exist
+
+        group = group_a  # Both teams are in the same group
+
+        # Update goals scored
+        rankings[group][team_a]['total_goals'] += goals_a
+        rankings[group][team_b]['total_goals'] += goals_b
+
+        # Determine match points and alternate points
+        if goals_a > goals_b:
+            rankings[group][team_a]['total_points'] += 3
+            rankings[group][team_a]['alternate_points'] += 5
+            rankings[group][team_b]['alternate_points'] += 1
+        elif goals_b > goals_a:
+            rankings[group][team_b]['total_points'] += 3
+            rankings[group][team_b]['alternate_points'] += 5
+            rankings[group][team_a]['alternate_points'] += 1
+        else:
+            rankings[group][team_a]['total_points'] += 1
+            rankings[group][team_b]['total_points'] += 1
+            rankings[group][team_a]['alternate_points'] += 3
+            rankings[group][team_b]['alternate_points'] += 3
+
+    # Group teams by their respective groups
+    grouped_rankings = {}
+    for team in teams:
+        group = team["group"]
+        if group not in grouped_rankings:
+            grouped_rankings[group] = []
+        if team["name"] in rankings[group]:
+            data = rankings[group][team["name"]]
+            grouped_rankings[group].append({'team': team["name"], **data})
+
+    # Sort teams within each group by the criteria
+    for group in grouped_rankings:
+        sorted_rankings = sorted(
+            grouped_rankings[group],
+            key=lambda item: (
+                -item['total_points'],
+                -item['total_goals'],
+                -item['alternate_points'],
+                item['registration_date']
+            )
+        )
+        grouped_rankings[group] = sorted_rankings
+
+    return grouped_rankings
+
+
+def random_tournament(seed: int, repeats: bool = False):
+    """Unvalidated teams and matches: few distinct scores and dates, so ties are common."""
+    rng = random.Random(seed)
+    groups = rng.randint(1, 6)
+    teams = [
+        {"name": f"team{i}", "date": f"{rng.randint(1, 4):02d}/{rng.randint(1, 2):02d}", "group": rng.randint(1, groups)}
+        for i in range(rng.randint(1, 30))
+    ]
+    if repeats:
+        for _ in range(rng.randint(1, 4)):
+            teams.append({**rng.choice(teams), "date": f"{rng.randint(1, 4):02d}/01", "group": rng.randint(1, groups)})
+    names = [team["name"] for team in teams] + ["unknown1", "unknown2"]
+    matches = []
+    for match_id in range(rng.randint(0, 80)):
+        team_a, team_b = rng.sample(names, 2) if len(names) > 1 else (names[0], names[0])
+        matches.append({"id": match_id, "team_a": team_a, "team_b": team_b, "goals_a": rng.randint(0, 3), "goals_b": rng.randint(0, 3)})
+    return teams, matches
+
+
+def validated(teams, matches):
+    return [validate_team_data(team) for team in teams], [validate_match_data(match) for match in matches]
+
+
+def first_registrations(teams):
+    seen = set()
+    return [team for team in teams if not (team["name"] in seen or seen.add(team["name"]))]
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_matches_previous_implementation(seed):
+    teams, matches = validated(*random_tournament(seed))
+    assert calculate_rankings(teams, matches) == previous_calculate_rankings(teams, matches)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_repeated_registrations_keep_the_first(seed):
+    # The previous implementation listed a repeated name twice; now its first registration counts
+    teams, matches = validated(*random_tournament(seed, repeats=True))
+    assert calculate_rankings(teams, matches) == previous_calculate_rankings(first_registrations(teams), matches)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_limit_keeps_the_top_of_each_group(seed):
+    teams, matches = validated(*random_tournament(seed, repeats=True))
+    full = calculate_rankings(teams, matches)
+    for limit in (1, 2, 4, 50):
+        assert calculate_rankings(teams, matches, limit) == {group: rows[:limit] for group, rows in full.items()}
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_partitions_merge_to_calculate_rankings(seed):
+    raw_teams, raw_matches = random_tournament(seed, repeats=True)
+    expected = calculate_rankings(*validated(raw_teams, raw_matches))
+    for parts in (1, 2, 3, 7):
+        groups, sets = partition_by_group(raw_teams, raw_matches, parts)
+        # Every team and match goes to some set, so each is still validated
+        assert sum(len(part[0]) for part in sets) == len(raw_teams)
+        assert sum(len(part[1]) for part in sets) == len(raw_matches)
+        ranked = {}
+        for part_teams, part_matches in sets:
+            ranked.update(rank_part(part_teams, part_matches, None))
+        assert {group: [dict(zip(ROW_FIELDS, row)) for row in ranked[group]] for group in groups} == expected
+
+
+def test_worker_pool_ranks_like_calculate_rankings():
+    pool = RankingPool(2, 0)
+    pool.start()
+    try:
+        for seed in range(5):
+            raw_teams, raw_matches = random_tournament(seed, repeats=True)
+            teams, matches = validated(raw_teams, raw_matches)
+            assert pool.rank(raw_teams, raw_matches) == calculate_rankings(teams, matches)
+            assert pool.rank(raw_teams, raw_matches, 2) == calculate_rankings(teams, matches, 2)
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_live_standings_match_calculate_rankings(seed):
+    teams, matches = validated(*random_tournament(seed))
+    standings = Standings()
+    standings.load(teams, matches)
+
+    # Groups are still unsorted here, so the top rows are selected from a heap
+    assert standings.rankings(2) == {group: rows[:2] for group, rows in calculate_rankings(teams, matches).items()}
+    expected = calculate_rankings(teams, matches)
+    assert standings.rankings() == expected
+    assert standings.rankings(3) == {group: rows[:3] for group, rows in expected.items()}
+    for group, rows in expected.items():
+        for rank, row in enumerate(rows, start=1):
+            assert standings.team_rank(row['team']) == {**row, 'group': group, 'rank': rank}
+    with pytest.raises(KeyError):
+        standings.team_rank("unknown1")
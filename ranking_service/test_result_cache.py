@@ -0,0 +1,129 @@
+"""Tests for the POST /rankings result cache, run with `python -m pytest ranking_service`."""
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from metrics import registry
+from result_cache import ResultCache, payload_key
+
+TEAMS = [
+    {"name": "a", "date": "01/01", "group": 1},
+    {"name": "b", "date": "02/01", "group": 1},
+    {"name": "c", "date": "03/01", "group": 1},
+]
+MATCHES = [{"id": 1, "team_a": "a", "team_b": "b", "goals_a": 2, "goals_b": 1}]
+
+
+def cache_requests(result: str) -> float:
+    return registry.get_sample_value("ranking_cache_requests_total", {"result": result}) or 0.0
+
+
+def test_concurrent_identical_requests_compute_once():
+    cache = ResultCache(8, 60)
+    calls = []
+    release = threading.Event()
+
+    def compute(value):
+        calls.append(value)
+        release.wait(5)
+        return value * 2
+
+    waiting = 7
+    coalesced = cache_requests("coalesced")
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("key", compute, 21))) for _ in range(waiting + 1)]
+    for thread in threads:
+        thread.start()
+    # Every other request has joined the computation in progress before it finishes
+    deadline = time.monotonic() + 5
+    while cache_requests("coalesced") - coalesced < waiting and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [21]
+    assert results == [42] * (waiting + 1)
+    assert cache.get_or_compute("key", compute, 0) == 42
+
+
+def test_errors_reach_waiting_requests_and_are_not_cached():
+    cache = ResultCache(8, 60)
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise ValueError("bad payload")
+
+    errors = []
+
+    def request():
+        try:
+            cache.get_or_compute("key", fail)
+        except ValueError as e:
+            errors.append(str(e))
+
+    coalesced = cache_requests("coalesced")
+    threads = [threading.Thread(target=request) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while cache_requests("coalesced") - coalesced < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert errors == ["bad payload"] * 3
+    assert cache.get_or_compute("key", lambda: "computed") == "computed"
+
+
+def test_entries_expire_and_least_recently_used_are_evicted():
+    cache = ResultCache(2, 60)
+    cache.get_or_compute("a", lambda: 1)
+    cache.get_or_compute("b", lambda: 2)
+    cache.get_or_compute("a", lambda: None)
+    cache.get_or_compute("c", lambda: 3)
+    assert cache.get_or_compute("a", lambda: "recomputed") == 1
+    assert cache.get_or_compute("b", lambda: "recomputed") == "recomputed"
+
+    expiring = ResultCache(2, 0)
+    expiring.get_or_compute("a", lambda: 1)
+    assert expiring.get_or_compute("a", lambda: "recomputed") == "recomputed"
+
+
+def test_payload_key_ignores_key_order_but_not_list_order():
+    reordered = [{"group": team["group"], "date": team["date"], "name": team["name"]} for team in TEAMS]
+    assert payload_key(reordered, MATCHES) == payload_key(TEAMS, MATCHES)
+    assert payload_key(TEAMS[::-1], MATCHES) != payload_key(TEAMS, MATCHES)
+
+
+@pytest.fixture
+def client():
+    main.ranking_cache.clear()
+    yield TestClient(main.app)
+    main.ranking_cache.clear()
+
+
+def test_post_rankings_caches_each_limit_separately(client, monkeypatch):
+    computed = []
+    compute_rankings = main.compute_rankings
+
+    def counting(payload, limit):
+        computed.append(limit)
+        return compute_rankings(payload, limit)
+
+    monkeypatch.setattr(main, "compute_rankings", counting)
+    payload = {"teams": TEAMS, "matches": MATCHES}
+
+    top = client.post("/rankings", params={"limit": 1}, json=payload).json()
+    full = client.post("/rankings", json=payload).json()
+    assert [row["team"] for row in top["1"]] == ["a"]
+    assert [row["team"] for row in full["1"]] == ["a", "b", "c"]
+
+    assert client.post("/rankings", params={"limit": 1}, json=payload).json() == top
+    assert client.post("/rankings", json=payload).json() == full
+    assert computed == [1, None]
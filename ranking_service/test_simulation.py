@@ -0,0 +1,77 @@
+"""Tests for the qualification simulation, run with `python -m pytest ranking_service`.
+
+With nothing left to play, every simulation ends in the current table, so
+the simulated standings must be calculate_rankings' exactly, ties included.
+"""
+import pytest
+
+import simulation
+from simulation import simulate_qualification
+from standings import calculate_rankings
+from test_rankings import SEEDS, random_tournament
+from validation import validate_match_result, validate_team_data
+
+
+def validated(teams, matches):
+    return [validate_team_data(team) for team in teams], [validate_match_result(match) for match in matches]
+
+
+def round_robin(groups: int, size: int):
+    teams = [{"name": f"g{group}t{slot}", "date": f"0{slot % 3 + 1}/01", "group": group} for group in range(groups) for slot in range(size)]
+    matches = [
+        {"team_a": team_a["name"], "team_b": team_b["name"], "goals_a": (position + offset) % 3, "goals_b": offset % 2}
+        for position, team_a in enumerate(teams)
+        for offset, team_b in enumerate(teams[position + 1:])
+        if team_a["group"] == team_b["group"]
+    ]
+    return validated(teams, matches)
+
+
+def assert_final_tables(result, teams, matches, qualifiers):
+    expected = calculate_rankings(teams, matches)
+    assert [entry['group'] for entry in result['groups']] == list(expected)
+    for entry in result['groups']:
+        rows = expected[entry['group']]
+        assert [
+            (team['team'], team['total_points'], team['total_goals'], team['alternate_points'])
+            for team in entry['teams']
+        ] == [(row['team'], row['total_points'], row['total_goals'], row['alternate_points']) for row in rows]
+        assert [team['remaining_matches'] for team in entry['teams']] == [0] * len(rows)
+        assert [team['qualification_probability'] for team in entry['teams']] == [
+            1.0 if rank < qualifiers else 0.0 for rank in range(len(rows))
+        ]
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_no_fixtures_left_reproduces_calculate_rankings(seed):
+    teams, matches = validated(*random_tournament(seed, repeats=True))
+    result = simulate_qualification(teams, matches, [], 20, seed, 2, 10)
+    assert result['simulations'] == 20 and result['complete']
+    assert_final_tables(result, teams, matches, 2)
+
+
+def test_played_round_robin_leaves_nothing_to_simulate():
+    teams, matches = round_robin(3, 5)
+    assert_final_tables(simulate_qualification(teams, matches, None, 50, 1, 4, 10), teams, matches, 4)
+
+
+def test_seeded_simulations_repeat_and_fill_every_qualifying_place():
+    teams, matches = round_robin(3, 6)
+    played = matches[::2]
+    result = simulate_qualification(teams, played, None, 2000, 7, 2, 10)
+    assert result == simulate_qualification(teams, played, None, 2000, 7, 2, 10)
+    for entry in result['groups']:
+        names = {team['team'] for team in entry['teams']}
+        unplayed = 15 - sum(1 for match in played if match['team_a'] in names)
+        # Each of the group's unplayed pairs is a remaining fixture for both of its teams
+        assert sum(team['remaining_matches'] for team in entry['teams']) == 2 * unplayed
+        # Every simulation qualifies exactly two teams of each group
+        assert sum(team['qualification_probability'] for team in entry['teams']) == pytest.approx(2)
+
+
+def test_budget_stops_simulations_early(monkeypatch):
+    # One simulation per chunk, and a budget spent after the first
+    monkeypatch.setattr(simulation, "CHUNK_CELLS", 1)
+    teams, matches = round_robin(2, 4)
+    result = simulate_qualification(teams, matches[:3], None, 1000, 3, 2, 0)
+    assert result['simulations'] == 1 and not result['complete']
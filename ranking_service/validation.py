@@ -0,0 +1,33 @@
+from datetime import datetime
+
+# Helper function to parse date strings
+def parse_date(date_str: str) -> datetime:
+    try:
+        return datetime.strptime(date_str, "%d/%m")
+    except ValueError:
+        raise ValueError(f"Invalid date format: {date_str}")
+
+# Helper function to validate and parse input data
+def validate_team_data(data: dict) -> dict:
+    if not all(key in data for key in ("name", "date", "group")):
+        raise ValueError("Missing required team fields")
+    return {
+        "name": str(data["name"]),
+        "date":  parse_date(data["date"]),
+        "group": int(data["group"])
+    }
+
+def validate_match_result(data: dict) -> dict:
+    if not all(key in data for key in ("team_a", "team_b", "goals_a", "goals_b")):
+        raise ValueError("Missing required match fields")
+    return {
+        "team_a": str(data["team_a"]),
+        "team_b": str(data["team_b"]),
+        "goals_a": int(data["goals_a"]),
+        "goals_b": int(data["goals_b"])
+    }
+
+def validate_match_data(data: dict) -> dict:
+    if "id" not in data:
+        raise ValueError("Missing required match fields")
+    return {**validate_match_result(data), "id": int(data["id"])}
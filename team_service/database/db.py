@@ -1,15 +1,96 @@
 import os
+import fcntl
+import uuid
 
-from sqlalchemy import create_engine, Column, Integer, String
+from contextlib import asynccontextmanager, contextmanager
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, Column, Integer, String, update, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from typing import Optional
+from metrics import instrument_engine
+from tracing import span, trace_statements
+from typing import Optional, Union
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# DB_ASYNC=1 serves requests from an async engine (asyncpg or aiosqlite) instead of the threadpool
+DB_ASYNC = os.getenv("DB_ASYNC", "0") == "1"
+# Async drivers used for each sync DATABASE_URL dialect
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+def async_database_url(url: str) -> str:
+    dialect, rest = url.split("://", 1)
+    return f"{ASYNC_DRIVERS[dialect.split('+')[0]]}://{rest}"
+
+# Engines are created by init_db at startup, in each worker process after it
+# has forked, so no two processes ever share a connection pool
+engine = None
+async_engine = None
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+AsyncSessionLocal = async_sessionmaker(autoflush=False) if DB_ASYNC else None
+AnySession = Union[Session, AsyncSession]
+# Connections per worker for the sync engine when requests use the async one
+SYNC_POOL_LIMIT = 2
+# Advisory lock id held while a worker runs init_db
+STARTUP_LOCK_KEY = 1001
+# Bind parameters one statement may carry: 32767 on PostgreSQL (asyncpg included), 32766 on SQLite
+MAX_BIND_PARAMETERS = 32766
+
+def pool_settings(reserved: int = 0, limit: Optional[int] = None) -> dict:
+    """Connection pool options for one worker process, from the DB_POOL_* settings.
+
+    DB_MAX_CONNECTIONS, when set, is the budget for the whole service: it is
+    split across WEB_CONCURRENCY workers, less `reserved` connections per
+    worker kept for another pool, and caps pool size plus overflow. `limit`
+    caps this pool on its own.
+    """
+    settings = {
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "1") == "1",
+    }
+    if DATABASE_URL.startswith("sqlite"):
+        return settings
+    pool_size = int(os.getenv("DB_POOL_SIZE", "5"))
+    max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    per_worker = limit
+    budget = os.getenv("DB_MAX_CONNECTIONS")
+    if budget:
+        workers = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+        # Startup holds a lock connection while it migrates on another, so never less than 2
+        share = max(2, int(budget) // workers - reserved)
+        per_worker = share if per_worker is None else min(per_worker, share)
+    if per_worker is not None:
+        pool_size = min(pool_size, per_worker)
+        max_overflow = min(max_overflow, per_worker - pool_size)
+    return {**settings, "pool_size": pool_size, "max_overflow": max_overflow}
+
+def create_engines():
+    global engine, async_engine
+    if engine is not None:
+        return
+    if DB_ASYNC:
+        async_engine = create_async_engine(async_database_url(DATABASE_URL), **pool_settings(reserved=SYNC_POOL_LIMIT))
+        AsyncSessionLocal.configure(bind=async_engine)
+        instrument_engine(async_engine.sync_engine, "async")
+        trace_statements(async_engine.sync_engine)
+        # Requests go through the async engine; the sync one only runs startup DDL
+        engine = create_engine(DATABASE_URL, **pool_settings(limit=SYNC_POOL_LIMIT))
+    else:
+        engine = create_engine(DATABASE_URL, **pool_settings())
+    instrument_engine(engine, "sync")
+    trace_statements(engine)
+    SessionLocal.configure(bind=engine)
+
+async def dispose_engines():
+    if async_engine is not None:
+        await async_engine.dispose()
+    if engine is not None:
+        engine.dispose()
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+# Name of this service's row in collection_versions
+COLLECTION = "teams"
 
 class Team(Base):
     __tablename__ = "teams"
@@ -18,12 +99,110 @@ class Team(Base):
     date = Column(String)
     group = Column(Integer)
 
-def get_db() -> Session:
-    db = SessionLocal()
-    try:
+class CollectionVersion(Base):
+    """Change counter for the service's data, served to clients as an ETag.
+
+    The epoch is random per database, so a recreated database never reuses
+    an old tag.
+    """
+    __tablename__ = "collection_versions"
+
+    name = Column(String, primary_key=True)
+    epoch = Column(String, nullable=False)
+    version = Column(Integer, nullable=False)
+
+def insert_ignoring_conflicts(db: Session, model, rows: list, returning):
+    """Inserts rows in multi-row statements, skipping rows that hit a unique constraint.
+
+    Each statement carries as many rows as fit in MAX_BIND_PARAMETERS; all of
+    them run in the caller's transaction. Returns the `returning` column of
+    the rows that were actually inserted.
+    """
+    dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+    chunk = max(1, MAX_BIND_PARAMETERS // max((len(row) for row in rows), default=1))
+    inserted = []
+    for start in range(0, len(rows), chunk):
+        statement = dialect.insert(model).values(rows[start:start + chunk]).on_conflict_do_nothing().returning(returning)
+        inserted.extend(row[0] for row in db.execute(statement))
+    return inserted
+
+def bump_version(db: Session):
+    """Marks the data as changed; call in the writing transaction, right before its commit."""
+    db.execute(
+        update(CollectionVersion)
+        .where(CollectionVersion.name == COLLECTION)
+        .values(version=CollectionVersion.version + 1)
+    )
+
+def read_etag(db: Session) -> str:
+    epoch, version = db.query(CollectionVersion.epoch, CollectionVersion.version).filter(
+        CollectionVersion.name == COLLECTION
+    ).one()
+    return f'"{epoch}-{version}"'
+
+async def current_etag() -> str:
+    async with open_session() as db:
+        return await run_db(db, read_etag)
+
+@asynccontextmanager
+async def open_session():
+    """An AsyncSession with DB_ASYNC=1, a sync Session otherwise."""
+    if DB_ASYNC:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(db.close)
+
+async def run_db(db: AnySession, fn, *args):
+    """Runs fn(session, *args), a plain sync function, without blocking the event loop.
+
+    An AsyncSession runs it on its async connection through run_sync; a sync
+    Session runs it in the threadpool. Endpoint logic is written once for both.
+    Each call is a span of the request's trace.
+    """
+    with span("db", function=fn.__qualname__):
+        if isinstance(db, AsyncSession):
+            return await db.run_sync(fn, *args)
+        return await run_in_threadpool(fn, db, *args)
+
+async def get_db() -> AnySession:
+    async with open_session() as db:
         yield db
-    finally:
-        db.close()
+
+@contextmanager
+def startup_lock():
+    """Serializes init_db across worker processes.
+
+    PostgreSQL uses an advisory lock; SQLite, which has none, a file lock
+    next to the database file.
+    """
+    if engine.dialect.name == "sqlite":
+        if engine.url.database in (None, "", ":memory:"):
+            yield
+            return
+        with open(f"{engine.url.database}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return
+    with engine.connect() as connection:
+        connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": STARTUP_LOCK_KEY})
+        try:
+            yield
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": STARTUP_LOCK_KEY})
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    create_engines()
+    # Workers starting together take turns, so schema changes run one at a time
+    with startup_lock():
+        Base.metadata.create_all(bind=engine)
+        with SessionLocal() as db:
+            insert_ignoring_conflicts(db, CollectionVersion, [{"name": COLLECTION, "epoch": uuid.uuid4().hex, "version": 0}], CollectionVersion.name)
+            db.commit()
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import Optional
 
 class TeamBase(BaseModel):
     name: str
@@ -12,3 +13,8 @@ class TeamUpdate(BaseModel):
     name: str
     date: str
     group: int
+
+class TeamBulkResult(BaseModel):
+    name: str
+    created: bool
+    detail: Optional[str] = None
@@ -1,50 +1,193 @@
-from fastapi import FastAPI, Depends, HTTPException
+import os
+import httpx
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from database.db import get_db, init_db, Team
-from database.models import TeamCreate, TeamUpdate
-from typing import List
+from database.db import get_db, init_db, dispose_engines, run_db, insert_ignoring_conflicts, bump_version, current_etag, AnySession, Team
+from database.models import TeamCreate, TeamUpdate, TeamBulkResult
+from metrics import instrument_app, mark_worker_stopped
+import tracing
+import wire
+from typing import List, Optional
 
-app = FastAPI()
+# Bodies are negotiated: MessagePack or JSON, and compressed when the client accepts it
+app = FastAPI(default_response_class=wire.NegotiatedResponse)
+app.router.route_class = wire.WireRoute
+
+MATCH_SERVICE_URL = os.getenv("MATCH_SERVICE_URL")
+# Teams accepted by one POST /teams/bulk; larger batches get a 413 and should be split
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "10000"))
+
+# Keep-alive client for cascading renames to the match service
+match_client: httpx.AsyncClient = None
+
+async def rename_matches(old_name: str, new_name: str):
+    """Moves every match of a team over to its new name, in one call to the match service."""
+    if not MATCH_SERVICE_URL:
+        raise HTTPException(status_code=500, detail="MATCH_SERVICE_URL environment variable not set")
+    try:
+        with tracing.span("call match_service", path="/matches/rename-team"):
+            response = await match_client.post(
+                f"{MATCH_SERVICE_URL}/matches/rename-team",
+                json={"old_name": old_name, "new_name": new_name},
+                headers=tracing.outgoing_headers()
+            )
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        print(f"Error renaming matches of '{old_name}': {e}")
+        raise HTTPException(status_code=502, detail="Failed to rename the team's matches")
+
+@app.middleware("http")
+async def collection_etag(request: Request, call_next):
+    # Collection GETs are tagged with the data's version; a client holding the current tag gets a
+    # bodiless 304. Single-row reads are one query anyway, so they skip the version lookup
+    if request.method != "GET" or request.url.path != "/teams":
+        return await call_next(request)
+    etag = await current_etag()
+    # MessagePack and JSON bodies share a tag, so caches must key them by Accept too
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept"})
+    response = await call_next(request)
+    if response.status_code == 200:
+        response.headers["ETag"] = etag
+        response.headers.add_vary_header("Accept")
+    return response
+
+# Added after the ETag check so its 304s are counted and traced too; compression, added last, is outermost
+instrument_app(app)
+tracing.instrument_app(app)
+app.add_middleware(wire.CompressionMiddleware)
 
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
+    global match_client
     # Initialize the database (create tables if they don't exist)
     init_db()
+    match_client = httpx.AsyncClient(timeout=httpx.Timeout(30.0, connect=5.0))
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await match_client.aclose()
+    await dispose_engines()
+    mark_worker_stopped()
+
+# Endpoints are async; their database work is a sync function handed to run_db,
+# which runs it on the async engine with DB_ASYNC=1 or in the threadpool otherwise
 
 @app.post("/teams", response_model=TeamCreate)
-def create_team(team: TeamCreate, db: Session = Depends(get_db)):
-    db_team = db.query(Team).filter(Team.name == team.name).first()
-    if db_team:
-        raise HTTPException(status_code=400, detail="Team already exists")
-    db_team = Team(**team.dict())
-    db.add(db_team)
-    db.commit()
-    db.refresh(db_team)
-    return db_team
+async def create_team(team: TeamCreate, db: AnySession = Depends(get_db)):
+    def create(db: Session):
+        db_team = db.query(Team).filter(Team.name == team.name).first()
+        if db_team:
+            raise HTTPException(status_code=400, detail="Team already exists")
+        db_team = Team(**team.dict())
+        db.add(db_team)
+        bump_version(db)
+        db.commit()
+        db.refresh(db_team)
+        return db_team
+    return await run_db(db, create)
+
+@app.post("/teams/bulk", response_model=List[TeamBulkResult])
+async def create_teams(teams: List[TeamCreate], db: AnySession = Depends(get_db)):
+    if len(teams) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ITEMS} teams can be added in one request")
+    def create(db: Session):
+        names = [team.name for team in teams]
+        existing = {name for (name,) in db.query(Team.name).filter(Team.name.in_(names))}
+
+        results = []
+        rows = []
+        for team in teams:
+            if team.name in existing:
+                results.append(TeamBulkResult(name=team.name, created=False, detail="Team already exists"))
+                continue
+            existing.add(team.name)
+            rows.append(team.dict())
+            results.append(TeamBulkResult(name=team.name, created=True))
+
+        if rows:
+            # Rows inserted concurrently by another request are reported as conflicts too
+            inserted = set(insert_ignoring_conflicts(db, Team, rows, Team.name))
+            for result in results:
+                if result.created and result.name not in inserted:
+                    result.created = False
+                    result.detail = "Team already exists"
+            bump_version(db)
+        db.commit()
+        return results
+    return await run_db(db, create)
 
 @app.get("/teams", response_model=List[TeamCreate])
-def read_teams(db: Session = Depends(get_db)):
-    return db.query(Team).all()
+async def read_teams(names: Optional[List[str]] = Query(None), db: AnySession = Depends(get_db)):
+    def read(db: Session):
+        # ?names=a&names=b narrows the result to those teams, in one IN query
+        query = db.query(Team)
+        if names is not None:
+            query = query.filter(Team.name.in_(names))
+        return query.all()
+    return await run_db(db, read)
+
+@app.post("/teams/lookup", response_model=List[TeamCreate])
+async def lookup_teams(names: List[str], db: AnySession = Depends(get_db)):
+    # Same as GET /teams?names=..., for lists too long for a URL
+    return await run_db(db, lambda db: db.query(Team).filter(Team.name.in_(names)).all())
 
 @app.get("/teams/{name}", response_model=TeamCreate)
-def read_team(name: str, db: Session = Depends(get_db)):
-    db_team = db.query(Team).filter(Team.name == name).first()
-    return db_team
+async def read_team(name: str, db: AnySession = Depends(get_db)):
+    return await run_db(db, lambda db: db.query(Team).filter(Team.name == name).first())
 
 @app.put("/teams/{old_name}", response_model=TeamCreate)
-def update_team(old_name: str, team: TeamUpdate, db: Session = Depends(get_db)):
-    db_team = db.query(Team).filter(Team.name == old_name).first()
-    if db_team is None:
-        raise HTTPException(status_code=404, detail="Team not found")
-    db_team.name = team.name
-    db_team.date = team.date
-    db_team.group = team.group
-    db.commit()
-    db.refresh(db_team)
-    return db_team
+async def update_team(old_name: str, team: TeamUpdate, db: AnySession = Depends(get_db)):
+    def check(db: Session):
+        names = {name for (name,) in db.query(Team.name).filter(Team.name.in_([old_name, team.name]))}
+        # Nothing is held open while the matches are renamed
+        db.rollback()
+        if old_name not in names:
+            raise HTTPException(status_code=404, detail="Team not found")
+        if team.name != old_name and team.name in names:
+            raise HTTPException(status_code=400, detail="Team already exists")
+
+    def apply(db: Session):
+        db_team = db.query(Team).filter(Team.name == old_name).first()
+        if db_team is None:
+            raise HTTPException(status_code=404, detail="Team not found")
+        db_team.name = team.name
+        db_team.date = team.date
+        db_team.group = team.group
+        try:
+            bump_version(db)
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise HTTPException(status_code=400, detail="Team already exists")
+        db.refresh(db_team)
+        return db_team
+
+    if team.name == old_name:
+        return await run_db(db, apply)
+
+    # The matches move first and the team row is then written in one short transaction,
+    # so no transaction stays open across the call to the match service
+    await run_db(db, check)
+    await rename_matches(old_name, team.name)
+    try:
+        return await run_db(db, apply)
+    except Exception:
+        # The team keeps its old name, so its matches are moved back
+        try:
+            await rename_matches(team.name, old_name)
+        except HTTPException:
+            # Repeating the same update finds the matches already moved and renames the team
+            print(f"Error restoring the matches of '{old_name}' after a failed rename to '{team.name}'")
+            raise HTTPException(status_code=502, detail="Team not renamed and its matches not restored; repeat the update")
+        raise
 
 @app.delete("/teams")
-def delete_all_teams(db: Session = Depends(get_db)):
-    db.query(Team).delete()
-    db.commit()
+async def delete_all_teams(db: AnySession = Depends(get_db)):
+    def delete(db: Session):
+        db.query(Team).delete()
+        bump_version(db)
+        db.commit()
+    await run_db(db, delete)
     return {"message": "All teams deleted successfully"}
@@ -0,0 +1,177 @@
+"""Negotiated wire formats: MessagePack or JSON bodies, gzip or zstd compression.
+
+Request bodies may be sent as Content-Type: application/msgpack and with
+Content-Encoding: gzip or zstd. Responses are MessagePack when the Accept
+header asks for it, and are compressed with zstd or gzip when the request's
+Accept-Encoding allows one and the body is at least WIRE_MIN_COMPRESS_SIZE
+bytes. Streamed responses are compressed as they go.
+"""
+import os
+import zlib
+from contextvars import ContextVar
+
+import msgpack
+import zstandard
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from starlette.datastructures import Headers, MutableHeaders
+
+MSGPACK = "application/msgpack"
+MIN_COMPRESS_SIZE = int(os.getenv("WIRE_MIN_COMPRESS_SIZE", "1024"))
+GZIP_LEVEL = 1
+ZSTD_LEVEL = 1
+
+# The format the current request's response is rendered in
+response_format: ContextVar[str] = ContextVar("response_format", default="json")
+
+def quality(header: str, name: str) -> float:
+    """The q-value `header` (an Accept or Accept-Encoding value) gives `name`, 0 if not listed."""
+    for part in header.split(","):
+        token, *params = [item.strip() for item in part.split(";")]
+        if token.lower() == name:
+            for param in params:
+                key, _, value = param.partition("=")
+                if key.strip() == "q":
+                    try:
+                        return float(value)
+                    except ValueError:
+                        return 0.0
+            return 1.0
+    return 0.0
+
+def response_encoding(accept_encoding: str):
+    # zstd compresses about as well as gzip for a fraction of the CPU, so it wins when both are offered
+    if quality(accept_encoding, "zstd") > 0:
+        return "zstd"
+    if quality(accept_encoding, "gzip") > 0:
+        return "gzip"
+    return None
+
+def decompress(body: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return zlib.decompress(body, 16 + zlib.MAX_WBITS)
+    if encoding == "zstd":
+        return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    raise ValueError(f"Unsupported Content-Encoding: {encoding}")
+
+def compressor(encoding: str):
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+class WireRequest(Request):
+    """A request whose body is decompressed, and whose MessagePack body reads as if it were JSON."""
+
+    def __init__(self, scope, receive):
+        super().__init__(scope, receive)
+        self.msgpack = self.headers.get("content-type", "").split(";")[0].strip() == MSGPACK
+        if self.msgpack:
+            # FastAPI only parses bodies it sees as JSON; json() below decodes MessagePack instead
+            raw = [(key, value) for key, value in scope["headers"] if key != b"content-type"]
+            self._headers = Headers(raw=raw + [(b"content-type", b"application/json")])
+
+    async def body(self) -> bytes:
+        if not hasattr(self, "_body"):
+            body = await super().body()
+            encoding = self.headers.get("content-encoding")
+            self._body = decompress(body, encoding) if encoding and encoding != "identity" else body
+        return self._body
+
+    async def json(self):
+        if not hasattr(self, "_json"):
+            if self.msgpack:
+                self._json = msgpack.unpackb(await self.body())
+            else:
+                return await super().json()
+        return self._json
+
+class WireRoute(APIRoute):
+    """Route class that reads requests as WireRequest and renders responses in the format they accept."""
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def negotiated_handler(request: Request):
+            accept = request.headers.get("accept", "")
+            token = response_format.set("msgpack" if quality(accept, MSGPACK) > quality(accept, "application/json") else "json")
+            try:
+                return await handler(WireRequest(request.scope, request.receive))
+            finally:
+                response_format.reset(token)
+
+        return negotiated_handler
+
+class NegotiatedResponse(JSONResponse):
+    """Default response class: JSON, or MessagePack when the request asked for it."""
+
+    def render(self, content) -> bytes:
+        if response_format.get() != "msgpack":
+            return super().render(content)
+        self.media_type = MSGPACK
+        if isinstance(content, dict):
+            # JSON object keys are strings; the same here, so both formats decode alike
+            content = {key if isinstance(key, str) else str(key): value for key, value in content.items()}
+        return msgpack.packb(content)
+
+class CompressionMiddleware:
+    """ASGI middleware compressing response bodies with the encoding the client accepts."""
+
+    def __init__(self, app, minimum_size: int = MIN_COMPRESS_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        encoding = response_encoding(Headers(scope=scope).get("accept-encoding", "")) if scope["type"] == "http" else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        stream = None
+        buffered = b""
+
+        async def compressing_send(message):
+            nonlocal start, stream, buffered
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body, more_body = message.get("body", b""), message.get("more_body", False)
+            if start is not None:
+                # Bodies often arrive in chunks; hold them until there is enough to be worth compressing
+                buffered += body
+                if more_body and len(buffered) < self.minimum_size:
+                    return
+                headers = MutableHeaders(raw=start["headers"])
+                if "content-encoding" not in headers and len(buffered) >= self.minimum_size:
+                    stream = compressor(encoding)
+                    headers["Content-Encoding"] = encoding
+                    headers.add_vary_header("Accept-Encoding")
+                    if "content-length" in headers:
+                        del headers["content-length"]
+                    body = stream.compress(buffered)
+                    if not more_body:
+                        body += stream.flush()
+                        headers["Content-Length"] = str(len(body))
+                else:
+                    body = buffered
+                start["headers"] = headers.raw
+                await send(start)
+                start, buffered = None, b""
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+                return
+
+            if stream is None:
+                await send(message)
+                return
+            compressed = stream.compress(body)
+            if not more_body:
+                compressed += stream.flush()
+            if compressed or not more_body:
+                await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+        await self.app(scope, receive, compressing_send)